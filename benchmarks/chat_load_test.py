@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Chat service concurrent-session load test
+
+Starts chat_service under uvicorn with a stub chat model that takes
+--llm-latency-ms per completion, then runs --sessions concurrent sessions of
+--turns sequential messages each and reports turn latency and throughput.
+
+  async     the stub's ainvoke awaits (what /chat does now)
+  blocking  the stub's ainvoke sleeps synchronously, which is what the old
+            llm.invoke call did to the worker's event loop
+
+With --url the workload runs against an already running chat service (real
+models) instead.
+
+Usage: python -m benchmarks.chat_load_test [--sessions 50] [--turns 5] [--mode both]
+"""
+
+import os
+import sys
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import threading
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--mode", default="both", choices=["async", "blocking", "both"])
+    parser.add_argument("--url", default=None, help="Run against a live chat service, e.g. http://localhost:8090")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    return parser.parse_args()
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) * 1000 if values else 0.0
+
+def install_stub_model(latency: float, blocking: bool):
+    """Route every chat model lookup to a stub with fixed latency"""
+    from langchain_core.messages import AIMessage
+    from libs.model_adapter import client_registry
+
+    class StubChatModel:
+        async def ainvoke(self, messages):
+            if blocking:
+                time.sleep(latency)
+            else:
+                await asyncio.sleep(latency)
+            return AIMessage(content=f"reply to: {messages[-1].content}")
+
+    stub = StubChatModel()
+    client_registry.chat_model = lambda *args, **kwargs: stub
+
+def start_server(app) -> tuple:
+    """Serve app on a free local port in a background thread; returns (server, url)"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+async def run_workload(url: str, sessions: int, turns: int, model: str) -> dict:
+    import httpx
+
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+
+    async with httpx.AsyncClient(base_url=url, timeout=120.0, limits=limits) as client:
+        async def session_loop():
+            nonlocal errors
+            session_id = str(uuid.uuid4())
+            await client.post("/sessions", json={"session_id": session_id, "model": model})
+            for turn in range(turns):
+                start = time.perf_counter()
+                response = await client.post(
+                    "/chat", json={"session_id": session_id, "message": f"message {turn}"}
+                )
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+            await client.delete(f"/sessions/{session_id}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session_loop() for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "turns": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99)
+    }
+
+def report(name: str, result: dict) -> None:
+    print(
+        f"{name:<10} {result['turns']:>6} turns  {result['errors']:>4} errors  "
+        f"{result['throughput']:>8.1f} turns/s  p50 {result['p50']:>8.1f} ms  "
+        f"p95 {result['p95']:>8.1f} ms  p99 {result['p99']:>8.1f} ms"
+    )
+
+def main():
+    args = parse_args()
+
+    if args.url:
+        report("live", asyncio.run(run_workload(args.url, args.sessions, args.turns, args.model)))
+        return
+
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["CHAT_SESSION_BACKEND"] = "memory"
+    os.environ["CHAT_MEMORY_SUMMARY_BATCH"] = str(10 ** 6)  # keep summaries out of the measurement
+
+    from services.chat_service.main import app
+
+    latency = args.llm_latency_ms / 1000
+    ideal = args.sessions / latency
+    print(f"{args.sessions} sessions x {args.turns} turns, stub model latency {args.llm_latency_ms:.0f} ms "
+          f"(ideal throughput {ideal:.0f} turns/s)")
+
+    modes = ["blocking", "async"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        install_stub_model(latency, blocking=(mode == "blocking"))
+        server, url = start_server(app)
+        try:
+            report(mode, asyncio.run(run_workload(url, args.sessions, args.turns, args.model)))
+        finally:
+            server.should_exit = True
+            time.sleep(0.2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark quantized local vector storage against the float32 baseline
+Reports recall@k, search-structure memory and single-threaded QPS per mode.
+
+Usage: python -m benchmarks.quantization_benchmark [--vectors 20000] [--dim 1536]
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import shutil
+import numpy as np
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from libs.utils.config import config
+from libs.vector_store.quantization import choose_subvectors
+from libs.vector_store.local_store import (
+    LocalVectorStore, VECTORS_FILE, NORMS_FILE, INT8_CODES_FILE,
+    INT8_SCALES_FILE, PQ_CODES_FILE, PQ_CODEBOOK_FILE
+)
+
+# Files each mode scans on every query (float rows are only touched for re-scoring)
+SEARCH_FILES = {
+    "none": [VECTORS_FILE, NORMS_FILE],
+    "int8": [INT8_CODES_FILE, INT8_SCALES_FILE, NORMS_FILE],
+    "pq": [PQ_CODES_FILE, PQ_CODEBOOK_FILE],
+}
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Unit-norm clustered vectors, shaped like ada embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def ground_truth(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    norms = np.einsum('ij,ij->i', vectors, vectors)
+    truth = []
+    for q in queries:
+        distances = norms - 2 * (vectors @ q)
+        truth.append(set(np.argpartition(distances, k)[:k].tolist()))
+    return truth
+
+def run_mode(store, mode, vectors, queries, truth, k, batch):
+    collection_id = f"bench_{mode}"
+    store.create_collection(collection_id, quantization=mode)
+
+    start = time.perf_counter()
+    for lo in range(0, len(vectors), batch):
+        hi = min(lo + batch, len(vectors))
+        store.add(
+            collection_id,
+            ids=[str(i) for i in range(lo, hi)],
+            embeddings=vectors[lo:hi],
+            metadatas=[{"doc_id": "bench"}] * (hi - lo),
+            documents=[""] * (hi - lo)
+        )
+    build_seconds = time.perf_counter() - start
+
+    # Warm up mmaps before timing
+    store.query(collection_id, queries[0], k)
+
+    recall = 0.0
+    start = time.perf_counter()
+    for q, expected in zip(queries, truth):
+        hits = store.query(collection_id, q, k)
+        recall += len(expected & {int(h["id"]) for h in hits}) / k
+    elapsed = time.perf_counter() - start
+
+    path = Path(store.root) / f"collection_{collection_id}"
+    memory = sum((path / f).stat().st_size for f in SEARCH_FILES[mode] if (path / f).exists())
+
+    return {
+        "mode": mode,
+        "recall": recall / len(queries),
+        "memory_mb": memory / 1024 / 1024,
+        "qps": len(queries) / elapsed,
+        "build_s": build_seconds,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--modes", default="none,int8,pq")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Train PQ as soon as the benchmark collection is loaded; never switch to HNSW
+    config.PQ_TRAIN_SIZE = min(config.PQ_TRAIN_SIZE, args.vectors)
+    config.LOCAL_HNSW_MIN_VECTORS = args.vectors + 1
+
+    print(f"📦 {args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.top_k}")
+    vectors = synthetic_embeddings(args.vectors, args.dim, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    truth = ground_truth(vectors, queries, args.top_k)
+
+    root = tempfile.mkdtemp(prefix="astraflow-quant-bench-")
+    try:
+        store = LocalVectorStore(root)
+        results = []
+        for mode in args.modes.split(","):
+            print(f"   ⏱  {mode}...")
+            results.append(run_mode(store, mode, vectors, queries, truth, args.top_k, args.batch))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    baseline = next((r for r in results if r["mode"] == "none"), results[0])
+    print(f"\n{'mode':<6} {'recall@' + str(args.top_k):>10} {'memory MB':>10} {'vs f32':>7} {'QPS':>9} {'build s':>8}")
+    for r in results:
+        ratio = r["memory_mb"] / baseline["memory_mb"] if baseline["memory_mb"] else 0
+        print(f"{r['mode']:<6} {r['recall']:>10.3f} {r['memory_mb']:>10.1f} {ratio:>6.2f}x {r['qps']:>9.1f} {r['build_s']:>8.1f}")
+    subvectors = choose_subvectors(args.dim, config.PQ_SUBVECTORS)
+    print(f"\nRe-score factor: {config.QUANTIZATION_RESCORE_FACTOR}, PQ subvectors: {subvectors}"
+          + (f" (PQ_SUBVECTORS={config.PQ_SUBVECTORS} doesn't divide {args.dim})" if subvectors != config.PQ_SUBVECTORS else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+RAG retrieval benchmark and recall harness
+
+Builds a synthetic collection through the real ingestion path (semantic_chunk,
+SQLite chunk rows, vector_store.add) with a stub embedding provider and stub
+LLM adapters, then runs query workloads against raw vector search, the API
+gateway's search_collection and the agent router. Reports p50/p95/p99 latency,
+QPS under concurrency and recall@k.
+
+Usage: python -m benchmarks.retrieval_benchmark [--documents 250] [--concurrency 16]
+"""
+
+import os
+import sys
+import time
+import zlib
+import uuid
+import random
+import asyncio
+import argparse
+import tempfile
+import shutil
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=250)
+    parser.add_argument("--sentences-per-doc", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--backend", default="local", choices=["local", "chroma"])
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) * 1000 if values else 0.0
+
+def make_document(rng: random.Random, sentences: int) -> str:
+    """Random-vocabulary prose so each chunk has a distinctive bag of words"""
+    return ". ".join(
+        " ".join(f"w{rng.randint(0, 50000)}" for _ in range(rng.randint(12, 28)))
+        for _ in range(sentences)
+    )
+
+async def run_workload(name, queries, call, concurrency, top_k):
+    """Run queries with bounded concurrency; call(query) -> list of hit chunk_ids"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    hits = 0
+
+    async def one(query_text, expected):
+        nonlocal hits
+        async with semaphore:
+            start = time.perf_counter()
+            chunk_ids = await call(query_text)
+            latencies.append(time.perf_counter() - start)
+            if expected in chunk_ids[:top_k]:
+                hits += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q, expected) for q, expected in queries))
+    wall = time.perf_counter() - start
+
+    return {
+        "workload": name,
+        "concurrency": concurrency,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "qps": len(queries) / wall,
+        "recall": hits / len(queries),
+    }
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="astraflow-rag-bench-")
+
+    # Point every service at throwaway storage before libs.utils.config is imported
+    os.environ["SQLITE_DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ["VECTOR_STORE_BACKEND"] = args.backend
+    os.environ["VECTOR_STORE_PATH"] = os.path.join(workdir, "vectors")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-stub")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-stub")
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+async def run(args):
+    from prometheus_client import REGISTRY
+    from libs.model_adapter import ModelAdapter
+    from libs.model_router import model_router
+    from libs.retrieval import EmbeddingProvider, set_embedding_provider, embed_query
+    from libs.vector_store import vector_store, exact_search
+    from services.api_gateway.database import db
+    from services.api_gateway import main as gateway
+    from services.agent_router import main as agent_router
+    from services.celery_worker.celery_app import index_document
+
+    class HashingEmbeddingProvider(EmbeddingProvider):
+        """Deterministic signed feature hashing of words; no network calls"""
+
+        def __init__(self, dim: int):
+            super().__init__(model="stub-hashing")
+            self.dim = dim
+
+        def embed(self, texts):
+            vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+            for row, text in enumerate(texts):
+                for word in text.replace(".", " ").split():
+                    h = zlib.crc32(word.encode())
+                    vectors[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            return (vectors / norms).tolist()
+
+        async def aembed(self, texts):
+            return self.embed(texts)
+
+    class StubAdapter(ModelAdapter):
+        def __init__(self, latency: float):
+            self.latency = latency
+
+        async def complete(self, prompt, model=None, stream=False, **kwargs):
+            await asyncio.sleep(self.latency)
+            return "stub answer"
+
+        def estimate_cost(self, *args, **kwargs):
+            return 0.0
+
+        def count_tokens(self, text, *args, **kwargs):
+            return len(text.split())
+
+    set_embedding_provider(HashingEmbeddingProvider(args.dim))
+    stub = StubAdapter(args.llm_latency_ms / 1000)
+    model_router.openai_adapter = stub
+    model_router.gemini_adapter = stub
+
+    rng = random.Random(args.seed)
+    user_id, collection_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    # Build the collection through the ingestion path
+    print(f"📚 Ingesting {args.documents} synthetic documents ({args.backend} backend)...")
+    await db.connect()
+    await db.conn.execute(
+        "INSERT INTO users (id, email, hashed_password) VALUES (?, ?, ?)",
+        (user_id, "bench@astraflow.local", "x")
+    )
+    await db.conn.execute(
+        "INSERT INTO collections (id, name, owner_id) VALUES (?, ?, ?)",
+        (collection_id, "benchmark", user_id)
+    )
+    await db.conn.commit()
+    vector_store.create_collection(collection_id)
+
+    start = time.perf_counter()
+    for _ in range(args.documents):
+        doc_id = str(uuid.uuid4())
+        await db.conn.execute(
+            "INSERT INTO documents (id, collection_id, filename, status) VALUES (?, ?, ?, ?)",
+            (doc_id, collection_id, f"{doc_id}.pdf", "processing")
+        )
+        await db.conn.commit()
+        await asyncio.to_thread(index_document, doc_id, collection_id, make_document(rng, args.sentences_per_doc))
+    ingest_seconds = time.perf_counter() - start
+
+    # Queries are word windows sampled from a known chunk (the expected hit)
+    cursor = await db.conn.execute("SELECT id, text FROM chunks")
+    chunks = await cursor.fetchall()
+    queries = []
+    for _ in range(args.queries):
+        chunk_id, text = rng.choice(chunks)
+        words = text.replace(".", " ").split()
+        pos = rng.randint(0, max(0, len(words) - 12))
+        queries.append((" ".join(words[pos:pos + 12]), chunk_id))
+    print(f"   ✓ {len(chunks)} chunks in {ingest_seconds:.1f}s")
+
+    # Exact ground truth for ANN recall (index quality, independent of query wording)
+    stored = vector_store.get(collection_id)
+    matrix = np.asarray(stored["embeddings"], dtype=np.float32)
+    ann_agreement = []
+
+    async def vector_search(query_text):
+        embedding = await embed_query(query_text)
+        hits = vector_store.search(collection_id, embedding, args.top_k)
+        top, _ = exact_search(matrix, embedding, args.top_k)
+        exact_ids = {stored["ids"][i] for i in top}
+        ann_agreement.append(len(exact_ids & {h["id"] for h in hits}) / max(len(exact_ids), 1))
+        return [h["metadata"].get("chunk_id") for h in hits]
+
+    async def gateway_search(query_text):
+        response = await gateway.search_collection(
+            collection_id, query_text, args.top_k,
+            expand_neighbors=False, neighbor_window=1, doc_ids=None, filename=None,
+            uploaded_after=None, uploaded_before=None, user_id=user_id
+        )
+        return [r["metadata"].get("chunk_id") for r in response["results"]]
+
+    async def agent_router_search(query_text):
+        response = await agent_router.search_collection(
+            collection_id, query_text, args.top_k,
+            expand_neighbors=False, neighbor_window=1, doc_ids=None, filename=None,
+            uploaded_after=None, uploaded_before=None
+        )
+        return [c["metadata"].get("chunk_id") for c in response.chunks]
+
+    workloads = [
+        ("vector_search", vector_search),
+        ("gateway", gateway_search),
+        ("agent_router", agent_router_search),
+    ]
+
+    results = []
+    for name, call in workloads:
+        for concurrency in sorted({1, args.concurrency}):
+            print(f"   ⏱  {name} (concurrency {concurrency})...")
+            results.append(await run_workload(name, queries, call, concurrency, args.top_k))
+
+    await db.disconnect()
+
+    print(f"\n{'workload':<14} {'conc':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'QPS':>8} {'recall@' + str(args.top_k):>9}")
+    for r in results:
+        print(f"{r['workload']:<14} {r['concurrency']:>5} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f} "
+              f"{r['qps']:>8.1f} {r['recall']:>9.3f}")
+
+    observed = REGISTRY.get_sample_value(
+        "vector_search_duration_seconds_count", {"collection_id": collection_id}
+    )
+    total = REGISTRY.get_sample_value(
+        "vector_search_duration_seconds_sum", {"collection_id": collection_id}
+    )
+    print(f"\nANN recall@{args.top_k} vs exact scoring: {np.mean(ann_agreement):.3f}")
+    print(f"vector_search_duration_seconds: {int(observed or 0)} observations, "
+          f"mean {1000 * (total or 0) / max(observed or 1, 1):.2f} ms")
+    print(f"Stub LLM latency: {args.llm_latency_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
-from .base import ModelAdapter
+from .base import ModelAdapter, BatchResult
 from .openai_adapter import OpenAIAdapter
 from .gemini_adapter import GeminiAdapter
+from .cache import ResponseCache, CachedModelAdapter
+from .tokenizer import count_tokens
+from .registry import ClientRegistry, client_registry
 
-__all__ = ["ModelAdapter", "OpenAIAdapter", "GeminiAdapter"]
+__all__ = ["ModelAdapter", "BatchResult", "OpenAIAdapter", "GeminiAdapter", "ResponseCache", "CachedModelAdapter", "count_tokens",
+           "ClientRegistry", "client_registry"]
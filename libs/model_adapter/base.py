@@ -1,5 +1,18 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Union, AsyncIterator
+from typing import List, NamedTuple, Optional, Union, AsyncIterator
+from libs.utils.config import config
+
+class BatchResult(NamedTuple):
+    """One item of complete_batch; exactly one of text and error is set"""
+    text: Optional[str] = None
+    error: Optional[Exception] = None
+    # Model that produced text, filled in by ModelRouter.complete_batch
+    model: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 class ModelAdapter(ABC):
     @abstractmethod
@@ -7,17 +20,52 @@ class ModelAdapter(ABC):
         self,
         prompt: str,
         model: str,
-        stream: bool = False
+        stream: bool = False,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None
     ) -> Union[str, AsyncIterator[str]]:
-        """Generate completion from LLM"""
+        """
+        Generate completion from LLM
+        system_prompt is sent ahead of the prompt; keep it static across calls so
+        providers can serve it from their prompt cache.
+        """
         pass
     
+    async def complete_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        use_batch_api: bool = False,
+        system_prompt: Optional[str] = None
+    ) -> List[BatchResult]:
+        """
+        Complete many prompts with at most `concurrency` calls in flight
+        Returns: one BatchResult per prompt, in order; failures don't abort the batch
+        """
+        semaphore = asyncio.Semaphore(concurrency or config.LLM_BATCH_CONCURRENCY)
+    
+        async def run(prompt: str) -> BatchResult:
+            async with semaphore:
+                try:
+                    return BatchResult(text=await self.complete(
+                        prompt, model, temperature=temperature, max_tokens=max_tokens,
+                        system_prompt=system_prompt
+                    ))
+                except Exception as e:
+                    return BatchResult(error=e)
+    
+        return await asyncio.gather(*(run(prompt) for prompt in prompts))
+    
     @abstractmethod
-    def estimate_cost(self, tokens: int, model: str) -> float:
-        """Estimate cost for token usage"""
+    def estimate_cost(self, input_tokens: int, output_tokens: int, model: str, cached_tokens: int = 0) -> float:
+        """Estimate cost for prompt and completion token usage; cached_tokens is the cached part of input_tokens"""
         pass
     
     @abstractmethod
-    def count_tokens(self, text: str) -> int:
-        """Count tokens in text"""
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        """Count tokens in text with the model's tokenizer"""
         pass
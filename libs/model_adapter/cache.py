@@ -0,0 +1,240 @@
+from .base import ModelAdapter, BatchResult
+import json
+import time
+import hashlib
+import redis.asyncio as redis
+from typing import List, Optional, Tuple, Union, AsyncIterator
+from libs.utils.config import config
+from libs.utils.logging import setup_logger
+from libs.utils.metrics import llm_cache_requests_total
+
+logger = setup_logger("llm-cache")
+
+KEY_PREFIX = "llm:cache:v1:"
+INDEX_KEY = "llm:cache:v1:index"
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially reformatted prompts share an entry"""
+    return " ".join(prompt.split())
+
+def cache_key(
+    provider: str,
+    model: str,
+    prompt: str,
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    system_prompt: Optional[str] = None
+) -> str:
+    fields = [provider, model, normalize_prompt(prompt), temperature, max_tokens]
+    if system_prompt:
+        # Appended only when set, so keys for plain prompts are unchanged
+        fields.append(normalize_prompt(system_prompt))
+    payload = json.dumps(fields, ensure_ascii=False)
+    return KEY_PREFIX + hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseCache:
+    """
+    Redis-backed completion store with a TTL per entry and a cap on entry count
+    Redis errors are logged and treated as misses; the cache never fails a request.
+    After an error Redis is skipped for LLM_CACHE_REDIS_RETRY_SECONDS, so an outage
+    doesn't add a timeout to every call.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        ttl: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None
+    ):
+        self.url = url or config.REDIS_URL
+        self.ttl = ttl or config.LLM_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or config.LLM_CACHE_MAX_ENTRIES
+        self.max_entry_bytes = max_entry_bytes or config.LLM_CACHE_MAX_ENTRY_BYTES
+        self._client = None
+        self._retry_at = 0.0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def failed(self, error: Exception) -> None:
+        logger.warning(f"LLM cache unavailable for {config.LLM_CACHE_REDIS_RETRY_SECONDS:g}s: {error}")
+        self._retry_at = time.monotonic() + config.LLM_CACHE_REDIS_RETRY_SECONDS
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Short timeouts: an unreachable Redis should cost a miss, not a stalled request
+            self._client = redis.Redis.from_url(self.url, socket_connect_timeout=0.5, socket_timeout=0.5)
+        return self._client
+
+    async def get(self, key: str) -> Optional[str]:
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """One MGET for all keys; None for misses"""
+        values = await self.client.mget(keys)
+        return [value.decode() if value is not None else None for value in values]
+
+    async def set(self, key: str, value: str) -> bool:
+        """
+        Store a completion and evict the oldest entries beyond max_entries
+        Returns: False if the value is over max_entry_bytes and was not stored
+        """
+        return await self.set_many([(key, value)]) == 1
+
+    async def set_many(self, items: List[Tuple[str, str]]) -> int:
+        """
+        Store completions in one pipeline, skipping values over max_entry_bytes
+        Returns: the number stored
+        """
+        entries = {key: value.encode() for key, value in items}
+        entries = {key: data for key, data in entries.items() if len(data) <= self.max_entry_bytes}
+        if not entries:
+            return 0
+
+        now = time.time()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, data in entries.items():
+                pipe.set(key, data, ex=self.ttl)
+            pipe.zadd(INDEX_KEY, {key: now for key in entries})
+            # Index entries for keys Redis has already expired
+            pipe.zremrangebyscore(INDEX_KEY, "-inf", now - self.ttl)
+            pipe.zcard(INDEX_KEY)
+            *_, size = await pipe.execute()
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [k for k, _ in await self.client.zpopmin(INDEX_KEY, overflow)]
+            if evicted:
+                await self.client.delete(*evicted)
+        return len(entries)
+
+class CachedModelAdapter(ModelAdapter):
+    """
+    Response cache in front of another adapter
+    Only deterministic requests (temperature 0) or opted-in task types are cached.
+    """
+
+    def __init__(
+        self,
+        adapter: ModelAdapter,
+        provider: str,
+        cache: Optional[ResponseCache] = None,
+        task_types: Optional[set] = None
+    ):
+        self.adapter = adapter
+        self.provider = provider
+        self.cache = cache or ResponseCache()
+        self.task_types = task_types if task_types is not None else config.LLM_CACHE_TASK_TYPES
+        self.enabled = config.LLM_CACHE_ENABLED
+
+    def cacheable(self, temperature: Optional[float], task_type: Optional[str]) -> bool:
+        return self.enabled and (temperature == 0 or task_type in self.task_types)
+
+    async def complete(
+        self,
+        prompt: str,
+        model: str,
+        stream: bool = False,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        task_type: Optional[str] = None
+    ) -> Union[str, AsyncIterator[str]]:
+        if not self.cacheable(temperature, task_type):
+            return await self.adapter.complete(
+                prompt, model, stream, temperature=temperature, max_tokens=max_tokens, system_prompt=system_prompt
+            )
+
+        key = cache_key(self.provider, model, prompt, temperature, max_tokens, system_prompt)
+        cached = await self._lookup(key, model)
+        if cached is not None:
+            if stream:
+                async def replay():
+                    yield cached
+                return replay()
+            return cached
+
+        response = await self.adapter.complete(
+            prompt, model, stream, temperature=temperature, max_tokens=max_tokens, system_prompt=system_prompt
+        )
+        if not stream:
+            await self._store(key, response)
+            return response
+
+        async def record():
+            chunks = []
+            async for chunk in response:
+                chunks.append(chunk)
+                yield chunk
+            # Only complete streams are cached; an abandoned stream never reaches here
+            await self._store(key, "".join(chunks))
+        return record()
+
+    async def complete_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        use_batch_api: bool = False,
+        system_prompt: Optional[str] = None,
+        task_type: Optional[str] = None
+    ) -> List[BatchResult]:
+        if not self.cacheable(temperature, task_type):
+            return await self.adapter.complete_batch(
+                prompts, model, temperature, max_tokens, concurrency, use_batch_api, system_prompt=system_prompt
+            )
+
+        # Serve what we can from the cache; only the misses go upstream
+        keys = [cache_key(self.provider, model, prompt, temperature, max_tokens, system_prompt) for prompt in prompts]
+        cached = await self._lookup_many(keys, model)
+        results = [BatchResult(text=text) if text is not None else None for text in cached]
+        misses = [i for i, text in enumerate(cached) if text is None]
+        if misses:
+            fresh = await self.adapter.complete_batch(
+                [prompts[i] for i in misses], model, temperature, max_tokens, concurrency, use_batch_api,
+                system_prompt=system_prompt
+            )
+            for i, result in zip(misses, fresh):
+                results[i] = result
+            await self._store_many([(keys[i], results[i].text) for i in misses if results[i].ok])
+        return results
+
+    async def _lookup(self, key: str, model: str) -> Optional[str]:
+        return (await self._lookup_many([key], model))[0]
+
+    async def _lookup_many(self, keys: List[str], model: str) -> List[Optional[str]]:
+        cached = None
+        if self.cache.available():
+            try:
+                cached = await self.cache.get_many(keys)
+            except Exception as e:
+                self.cache.failed(e)
+        if cached is None:
+            llm_cache_requests_total.labels(provider=self.provider, model=model, result="error").inc(len(keys))
+            return [None] * len(keys)
+
+        for value in cached:
+            result = "hit" if value is not None else "miss"
+            llm_cache_requests_total.labels(provider=self.provider, model=model, result=result).inc()
+        return cached
+
+    async def _store(self, key: str, value: str) -> None:
+        await self._store_many([(key, value)])
+
+    async def _store_many(self, items: List[Tuple[str, str]]) -> None:
+        if not items or not self.cache.available():
+            return
+        try:
+            await self.cache.set_many(items)
+        except Exception as e:
+            self.cache.failed(e)
+
+    def estimate_cost(self, input_tokens: int, output_tokens: int, model: str, cached_tokens: int = 0) -> float:
+        return self.adapter.estimate_cost(input_tokens, output_tokens, model, cached_tokens)
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        return self.adapter.count_tokens(text, model)
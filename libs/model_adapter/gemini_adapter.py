@@ -1,57 +1,164 @@
 from .base import ModelAdapter
+from .rate_limit import RateLimiter, parse_limits, is_rate_limit, retry_after
+from .tokenizer import count_gemini_tokens
+from .registry import client_registry
+import time
+import asyncio
+import hashlib
 import google.generativeai as genai
-from typing import Union, AsyncIterator
+from google.generativeai import caching
+from typing import Dict, Optional, Tuple, Union, AsyncIterator
 from libs.utils.config import config
 from libs.utils.logging import setup_logger
-from libs.utils.metrics import llm_api_calls_total, llm_tokens_used_total
+from libs.utils.metrics import llm_api_calls_total, llm_tokens_used_total, llm_cached_tokens_total
 
 logger = setup_logger("gemini-adapter")
 
+# Explicit context caches must be created against a pinned model version
+CONTEXT_CACHE_MODELS = {
+    "gemini-1.5-pro": "models/gemini-1.5-pro-002",
+}
+
 class GeminiAdapter(ModelAdapter):
     def __init__(self):
         genai.configure(api_key=config.GEMINI_API_KEY)
+        self.limiter = RateLimiter(
+            "gemini", config.GEMINI_RPM, config.GEMINI_TPM, parse_limits(config.GEMINI_RATE_LIMITS)
+        )
         self.pricing = {
             "gemini-pro": {"input": 0.00025 / 1000, "output": 0.0005 / 1000},
+            "gemini-1.5-pro": {"input": 0.00125 / 1000, "cached_input": 0.0003125 / 1000, "output": 0.005 / 1000},
         }
+        # (model, system prompt hash) -> (CachedContent, expires_at)
+        self._context_caches: Dict[Tuple[str, str], tuple] = {}
     
     async def complete(
         self,
         prompt: str,
         model: str = "gemini-pro",
-        stream: bool = False
+        stream: bool = False,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None
     ) -> Union[str, AsyncIterator[str]]:
+        input_tokens = self.count_tokens(prompt, model) + (self.count_tokens(system_prompt, model) if system_prompt else 0)
+        # Reserve prompt + max output tokens, as providers count it against TPM
+        await self.limiter.acquire(
+            model, input_tokens + (max_tokens or config.RATE_LIMIT_DEFAULT_OUTPUT_TOKENS)
+        )
+        
         try:
-            model_instance = genai.GenerativeModel(model)
+            model_instance = await self._model_for(model, system_prompt)
+            generation_config = genai.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_tokens
+            )
             
+            # generate_content_async runs on the async gRPC transport, so a slow
+            # Gemini call never blocks the caller's event loop
             if stream:
-                response = model_instance.generate_content(prompt, stream=True)
+                response = await model_instance.generate_content_async(
+                    prompt, generation_config=generation_config, stream=True
+                )
                 async def stream_generator():
-                    for chunk in response:
-                        if chunk.text:
+                    parts = []
+                    usage = None
+                    async for chunk in response:
+                        # usage_metadata is cumulative; the last chunk has the totals
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        if chunk.parts and chunk.text:
+                            parts.append(chunk.text)
                             yield chunk.text
+                    self._record_usage(model, input_tokens, "".join(parts), usage)
                 return stream_generator()
             else:
-                response = model_instance.generate_content(prompt)
-                tokens = self.count_tokens(prompt + response.text)
-                cost = self.estimate_cost(tokens, model)
-                
-                llm_api_calls_total.labels(provider="gemini", model=model).inc()
-                llm_tokens_used_total.labels(provider="gemini", model=model).inc(tokens)
-                
-                logger.info(f"Gemini call: {model}, tokens: {tokens}, cost: ${cost:.4f}")
+                response = await model_instance.generate_content_async(
+                    prompt, generation_config=generation_config
+                )
+                self._record_usage(model, input_tokens, response.text, getattr(response, "usage_metadata", None))
                 return response.text
         
         except Exception as e:
             logger.error(f"Gemini API error: {e}")
+            if is_rate_limit(e):
+                await self.limiter.penalize(model, retry_after(e) or config.RATE_LIMIT_BACKOFF_SECONDS)
             raise
     
-    def estimate_cost(self, tokens: int, model: str) -> float:
+    async def _model_for(self, model: str, system_prompt: Optional[str]) -> genai.GenerativeModel:
+        """
+        Model instance for a system prompt; each distinct prompt gets its own cached
+        instance, so system_prompt is meant for static preambles
+        """
+        if not system_prompt:
+            return client_registry.gemini_model(model)
+        cached_content = await self._context_cache(model, system_prompt)
+        if cached_content is not None:
+            return client_registry.gemini_cached_model(cached_content)
+        return client_registry.gemini_model(model, system_instruction=system_prompt)
+    
+    async def _context_cache(self, model: str, system_prompt: str):
+        """
+        Explicit context cache holding a long system prompt, created once and
+        extended before it expires
+        Returns: CachedContent, or None if the model/prompt doesn't qualify or the API call failed
+        """
+        version = CONTEXT_CACHE_MODELS.get(model)
+        if not config.GEMINI_CONTEXT_CACHE_ENABLED or version is None:
+            return None
+        if self.count_tokens(system_prompt, model) < config.GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        
+        key = (model, hashlib.sha256(system_prompt.encode()).hexdigest())
+        ttl = config.GEMINI_CONTEXT_CACHE_TTL_SECONDS
+        now = time.time()
+        entry = self._context_caches.get(key)
+        if entry and entry[1] - now > ttl / 4:
+            return entry[0]
+        
+        # The SDK's caching calls are blocking HTTP; keep them off the event loop.
+        # Concurrent first requests may each create a cache; the extras just expire.
+        try:
+            if entry:
+                await asyncio.to_thread(entry[0].update, ttl=ttl)
+                cached_content = entry[0]
+            else:
+                cached_content = await asyncio.to_thread(
+                    caching.CachedContent.create, model=version, system_instruction=system_prompt, ttl=ttl
+                )
+                logger.info(f"Created Gemini context cache {cached_content.name} for {model}")
+        except Exception as e:
+            logger.warning(f"Gemini context cache unavailable for {model}, sending system prompt inline: {e}")
+            self._context_caches.pop(key, None)
+            return None
+        
+        self._context_caches[key] = (cached_content, now + ttl)
+        return cached_content
+    
+    def _record_usage(self, model: str, input_tokens: int, output: str, usage=None) -> None:
+        # Prefer Gemini's reported counts; fall back to the local approximation
+        input_tokens = getattr(usage, "prompt_token_count", 0) or input_tokens
+        output_tokens = getattr(usage, "candidates_token_count", 0) or self.count_tokens(output, model)
+        cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+        cost = self.estimate_cost(input_tokens, output_tokens, model, cached_tokens)
+        
+        llm_api_calls_total.labels(provider="gemini", model=model).inc()
+        llm_tokens_used_total.labels(provider="gemini", model=model, token_type="input").inc(input_tokens)
+        llm_tokens_used_total.labels(provider="gemini", model=model, token_type="output").inc(output_tokens)
+        llm_cached_tokens_total.labels(provider="gemini", model=model).inc(cached_tokens)
+        
+        logger.info(
+            f"Gemini call: {model}, tokens: {input_tokens} in ({cached_tokens} cached) / {output_tokens} out, "
+            f"cost: ${cost:.4f}"
+        )
+    
+    def estimate_cost(self, input_tokens: int, output_tokens: int, model: str, cached_tokens: int = 0) -> float:
         if model not in self.pricing:
             return 0.0
-        input_tokens = tokens // 2
-        output_tokens = tokens // 2
-        return (input_tokens * self.pricing[model]["input"] + 
-                output_tokens * self.pricing[model]["output"])
+        price = self.pricing[model]
+        # Cache storage is billed separately by the hour and isn't included here
+        return ((input_tokens - cached_tokens) * price["input"] +
+                cached_tokens * price.get("cached_input", price["input"]) +
+                output_tokens * price["output"])
     
-    def count_tokens(self, text: str) -> int:
-        return len(text.split()) * 1.3
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        return count_gemini_tokens(text, model)
@@ -1,63 +1,219 @@
-from .base import ModelAdapter
-from openai import AsyncOpenAI
-from typing import Union, AsyncIterator
+from .base import ModelAdapter, BatchResult
+from .rate_limit import RateLimiter, parse_limits, is_rate_limit, retry_after
+from .tokenizer import count_openai_tokens
+import json
+import asyncio
+from .registry import client_registry
+from typing import List, Optional, Union, AsyncIterator
 from libs.utils.config import config
 from libs.utils.logging import setup_logger
-from libs.utils.metrics import llm_api_calls_total, llm_tokens_used_total
+from libs.utils.metrics import llm_api_calls_total, llm_tokens_used_total, llm_cached_tokens_total
 
 logger = setup_logger("openai-adapter")
 
+def build_messages(prompt: str, system_prompt: Optional[str] = None) -> List[dict]:
+    """
+    Static system prompt first, then the variable prompt
+    OpenAI caches prompt prefixes of 1024+ tokens automatically, so keeping the
+    stable part at the front is what makes repeat requests hit the cache.
+    """
+    messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def cached_prompt_tokens(usage) -> int:
+    """Cached input tokens from an OpenAI usage object or dict (0 if not reported)"""
+    if usage is None:
+        return 0
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return 0
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    return cached or 0
+
 class OpenAIAdapter(ModelAdapter):
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+        self.limiter = RateLimiter(
+            "openai", config.OPENAI_RPM, config.OPENAI_TPM, parse_limits(config.OPENAI_RATE_LIMITS)
+        )
         self.pricing = {
             "gpt-3.5-turbo": {"input": 0.0015 / 1000, "output": 0.002 / 1000},
             "gpt-4": {"input": 0.03 / 1000, "output": 0.06 / 1000},
             "gpt-4-turbo": {"input": 0.01 / 1000, "output": 0.03 / 1000},
+            "gpt-4o": {"input": 0.0025 / 1000, "cached_input": 0.00125 / 1000, "output": 0.01 / 1000},
         }
     
+    @property
+    def client(self):
+        return client_registry.openai_async_client()
+    
     async def complete(
         self,
         prompt: str,
         model: str = "gpt-3.5-turbo",
-        stream: bool = False
+        stream: bool = False,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None
     ) -> Union[str, AsyncIterator[str]]:
+        input_tokens = self.count_tokens(prompt, model) + (self.count_tokens(system_prompt, model) if system_prompt else 0)
+        # Reserve prompt + max output tokens, as providers count it against TPM
+        await self.limiter.acquire(
+            model, input_tokens + (max_tokens or config.RATE_LIMIT_DEFAULT_OUTPUT_TOKENS)
+        )
+        
         try:
+            params = {}
+            if temperature is not None:
+                params["temperature"] = temperature
+            if max_tokens is not None:
+                params["max_tokens"] = max_tokens
+            if stream:
+                # Final chunk carries usage (and no choices)
+                params["stream_options"] = {"include_usage": True}
+            
             response = await self.client.chat.completions.create(
                 model=model,
-                messages=[{"role": "user", "content": prompt}],
-                stream=stream
+                messages=build_messages(prompt, system_prompt),
+                stream=stream,
+                **params
             )
             
             if stream:
                 async def stream_generator():
+                    parts = []
+                    usage = None
                     async for chunk in response:
-                        if chunk.choices[0].delta.content:
+                        if chunk.usage:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
                             yield chunk.choices[0].delta.content
+                    if usage:
+                        self._record_usage(model, usage.prompt_tokens, usage.completion_tokens, cached_prompt_tokens(usage))
+                    else:
+                        self._record_usage(model, input_tokens, self.count_tokens("".join(parts), model))
                 return stream_generator()
             else:
-                tokens = response.usage.total_tokens
-                cost = self.estimate_cost(tokens, model)
-                
-                llm_api_calls_total.labels(provider="openai", model=model).inc()
-                llm_tokens_used_total.labels(provider="openai", model=model).inc(tokens)
-                
-                logger.info(f"OpenAI call: {model}, tokens: {tokens}, cost: ${cost:.4f}")
-                return response.choices[0].message.content
+                content = response.choices[0].message.content
+                if response.usage:
+                    self._record_usage(
+                        model, response.usage.prompt_tokens, response.usage.completion_tokens,
+                        cached_prompt_tokens(response.usage)
+                    )
+                else:
+                    self._record_usage(model, input_tokens, self.count_tokens(content or "", model))
+                return content
         
         except Exception as e:
             logger.error(f"OpenAI API error: {e}")
+            if is_rate_limit(e):
+                await self.limiter.penalize(model, retry_after(e) or config.RATE_LIMIT_BACKOFF_SECONDS)
             raise
     
-    def estimate_cost(self, tokens: int, model: str) -> float:
+    async def complete_batch(
+        self,
+        prompts: List[str],
+        model: str = "gpt-3.5-turbo",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        use_batch_api: bool = False,
+        system_prompt: Optional[str] = None
+    ) -> List[BatchResult]:
+        if not use_batch_api:
+            return await super().complete_batch(
+                prompts, model, temperature, max_tokens, concurrency, system_prompt=system_prompt
+            )
+        return await self._run_batch_job(prompts, model, temperature, max_tokens, system_prompt)
+    
+    async def _run_batch_job(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        system_prompt: Optional[str] = None
+    ) -> List[BatchResult]:
+        """Submit prompts to the Batch API (24h window, half price) and wait for the output file"""
+        params = {}
+        if temperature is not None:
+            params["temperature"] = temperature
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        
+        lines = [
+            json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": model, "messages": build_messages(prompt, system_prompt), **params}
+            })
+            for i, prompt in enumerate(prompts)
+        ]
+        input_file = await self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode()),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"OpenAI batch {batch.id} submitted: {len(prompts)} prompts, {model}")
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(config.LLM_BATCH_POLL_SECONDS)
+            batch = await self.client.batches.retrieve(batch.id)
+        
+        missing = RuntimeError(f"No result in OpenAI batch {batch.id} (status: {batch.status})")
+        results = [BatchResult(error=missing) for _ in prompts]
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                index = int(item["custom_id"])
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    body = response["body"]
+                    usage = body.get("usage") or {}
+                    self._record_usage(
+                        model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+                        cached_prompt_tokens(usage)
+                    )
+                    results[index] = BatchResult(text=body["choices"][0]["message"]["content"])
+                else:
+                    error = item.get("error") or response.get("body", {}).get("error") or {}
+                    results[index] = BatchResult(error=RuntimeError(error.get("message", "OpenAI batch request failed")))
+        
+        logger.info(f"OpenAI batch {batch.id} {batch.status}: {sum(r.ok for r in results)}/{len(prompts)} succeeded")
+        return results
+    
+    def _record_usage(self, model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> None:
+        cost = self.estimate_cost(input_tokens, output_tokens, model, cached_tokens)
+        
+        llm_api_calls_total.labels(provider="openai", model=model).inc()
+        llm_tokens_used_total.labels(provider="openai", model=model, token_type="input").inc(input_tokens)
+        llm_tokens_used_total.labels(provider="openai", model=model, token_type="output").inc(output_tokens)
+        llm_cached_tokens_total.labels(provider="openai", model=model).inc(cached_tokens)
+        
+        logger.info(
+            f"OpenAI call: {model}, tokens: {input_tokens} in ({cached_tokens} cached) / {output_tokens} out, "
+            f"cost: ${cost:.4f}"
+        )
+    
+    def estimate_cost(self, input_tokens: int, output_tokens: int, model: str, cached_tokens: int = 0) -> float:
         if model not in self.pricing:
             return 0.0
-        # Simplified: assume 50/50 input/output split
-        input_tokens = tokens // 2
-        output_tokens = tokens // 2
-        return (input_tokens * self.pricing[model]["input"] + 
-                output_tokens * self.pricing[model]["output"])
+        price = self.pricing[model]
+        # Models without a cached_input price bill cached tokens at the full rate
+        return ((input_tokens - cached_tokens) * price["input"] +
+                cached_tokens * price.get("cached_input", price["input"]) +
+                output_tokens * price["output"])
     
-    def count_tokens(self, text: str) -> int:
-        # Simplified token counting
-        return len(text.split()) * 1.3  # Rough approximation
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        return count_openai_tokens(text, model)
@@ -0,0 +1,220 @@
+import time
+import asyncio
+from contextvars import ContextVar
+import redis.asyncio as redis
+from typing import Dict, Optional, Tuple
+from libs.utils.config import config
+from libs.utils.logging import setup_logger
+from libs.utils.metrics import llm_rate_limit_queue_depth, llm_rate_limit_wait_seconds
+
+logger = setup_logger("rate-limiter")
+
+KEY_PREFIX = "llm:ratelimit:"
+
+# Refill both buckets for the elapsed time, then either take one request plus
+# `need` tokens or report how long until that will be possible. Uses Redis TIME
+# so every process shares one clock.
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rpm, tpm, need = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local b = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts', 'blocked')
+local req = tonumber(b[1]) or rpm
+local tok = tonumber(b[2]) or tpm
+local ts = tonumber(b[3]) or now
+local blocked = tonumber(b[4]) or 0
+local elapsed = math.max(0, now - ts)
+req = math.min(rpm, req + elapsed * rpm / 60)
+tok = math.min(tpm, tok + elapsed * tpm / 60)
+need = math.min(need, tpm)
+local wait = 0
+if now < blocked then
+  wait = blocked - now
+elseif req < 1 or tok < need then
+  wait = math.max((1 - req) * 60 / rpm, (need - tok) * 60 / tpm)
+else
+  req = req - 1
+  tok = tok - need
+end
+redis.call('HSET', KEYS[1], 'req', req, 'tok', tok, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+PENALIZE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local until_ts = now + tonumber(ARGV[1])
+local blocked = tonumber(redis.call('HGET', KEYS[1], 'blocked')) or 0
+redis.call('HSET', KEYS[1], 'blocked', math.max(blocked, until_ts))
+redis.call('EXPIRE', KEYS[1], 120 + math.ceil(tonumber(ARGV[1])))
+return 1
+"""
+
+class RateLimitTimeout(Exception):
+    """A caller waited longer than RATE_LIMIT_MAX_WAIT_SECONDS for capacity"""
+
+    def __init__(self, provider: str, model: str, waited: float):
+        self.provider = provider
+        self.model = model
+        super().__init__(f"Rate limit queue for {provider}/{model} exceeded {waited:.1f}s")
+
+# Provider-side rate limits; RateLimitTimeout is our own queue and deliberately not one
+RATE_LIMIT_ERRORS = {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+
+# Seconds the current task has spent queued in RateLimiter.acquire, so callers
+# timing a provider call can leave the queue out of its latency
+queue_wait: ContextVar[float] = ContextVar("rate_limit_queue_wait", default=0.0)
+
+def is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ in RATE_LIMIT_ERRORS
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a provider's Retry-After header, if the error carries one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse "model=rpm:tpm,model=rpm:tpm" overrides"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (int(rpm), int(tpm))
+    return limits
+
+class _LocalBucket:
+    """In-process fallback with the same refill rules as ACQUIRE_SCRIPT"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.req = float(rpm)
+        self.tok = float(tpm)
+        self.ts = time.time()
+        self.blocked = 0.0
+
+    def acquire(self, rpm: int, tpm: int, need: int) -> float:
+        now = time.time()
+        elapsed = max(0.0, now - self.ts)
+        self.req = min(rpm, self.req + elapsed * rpm / 60)
+        self.tok = min(tpm, self.tok + elapsed * tpm / 60)
+        self.ts = now
+        need = min(need, tpm)
+        if now < self.blocked:
+            return self.blocked - now
+        if self.req < 1 or self.tok < need:
+            return max((1 - self.req) * 60 / rpm, (need - self.tok) * 60 / tpm)
+        self.req -= 1
+        self.tok -= need
+        return 0.0
+
+    def penalize(self, seconds: float) -> None:
+        self.blocked = max(self.blocked, time.time() + seconds)
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min buckets per provider model, shared across processes
+    through Redis. Callers in one process queue FIFO behind a lock, so a burst waits
+    its turn instead of every caller hammering the bucket (or the provider).
+    """
+
+    def __init__(self, provider: str, rpm: int, tpm: int, overrides: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.provider = provider
+        self.default_limits = (rpm, tpm)
+        self.overrides = overrides or {}
+        self.max_wait = config.RATE_LIMIT_MAX_WAIT_SECONDS
+        self.enabled = config.RATE_LIMIT_ENABLED
+        self._client = None
+        self._scripts = None
+        # Redis is skipped until then after a failure, instead of paying the connect timeout per call
+        self._redis_retry_at = 0.0
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._local: Dict[str, _LocalBucket] = {}
+
+    def _get_scripts(self):
+        """Returns: (acquire, penalize) scripts, or None while Redis is being skipped"""
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        if self._client is None:
+            self._client = redis.Redis.from_url(config.REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+            self._scripts = (
+                self._client.register_script(ACQUIRE_SCRIPT),
+                self._client.register_script(PENALIZE_SCRIPT)
+            )
+        return self._scripts
+
+    def limits(self, model: str) -> Tuple[int, int]:
+        return self.overrides.get(model, self.default_limits)
+
+    def _key(self, model: str) -> str:
+        return f"{KEY_PREFIX}{self.provider}:{model}"
+
+    async def _try_acquire(self, model: str, tokens: int) -> float:
+        """Returns: 0 if capacity was taken, else seconds until it may be available"""
+        rpm, tpm = self.limits(model)
+        scripts = self._get_scripts()
+        if scripts is not None:
+            try:
+                return float(await scripts[0](keys=[self._key(model)], args=[rpm, tpm, tokens]))
+            except Exception as e:
+                self._redis_failed(e)
+        # Redis down: keep limiting, just per process
+        bucket = self._local.setdefault(model, _LocalBucket(rpm, tpm))
+        return bucket.acquire(rpm, tpm, tokens)
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(
+            f"Rate limiter falling back to local buckets for {config.RATE_LIMIT_REDIS_RETRY_SECONDS:g}s: {error}"
+        )
+        self._redis_retry_at = time.monotonic() + config.RATE_LIMIT_REDIS_RETRY_SECONDS
+
+    async def acquire(self, model: str, tokens: int) -> None:
+        """
+        Wait (FIFO) until one request and `tokens` tokens are available for model
+        The time spent waiting is added to queue_wait.
+        """
+        if not self.enabled:
+            return
+
+        lock = self._locks.setdefault(model, asyncio.Lock())
+        depth = llm_rate_limit_queue_depth.labels(provider=self.provider, model=model)
+        start = time.perf_counter()
+        depth.inc()
+        try:
+            remaining = self.max_wait
+            await asyncio.wait_for(lock.acquire(), timeout=remaining)
+            try:
+                while True:
+                    wait = await self._try_acquire(model, tokens)
+                    if wait <= 0:
+                        break
+                    remaining = self.max_wait - (time.perf_counter() - start)
+                    if wait > remaining:
+                        raise RateLimitTimeout(self.provider, model, self.max_wait)
+                    await asyncio.sleep(wait)
+            finally:
+                lock.release()
+        except asyncio.TimeoutError:
+            raise RateLimitTimeout(self.provider, model, self.max_wait)
+        finally:
+            depth.dec()
+            waited = time.perf_counter() - start
+            queue_wait.set(queue_wait.get() + waited)
+            llm_rate_limit_wait_seconds.labels(provider=self.provider, model=model).observe(waited)
+
+    async def penalize(self, model: str, seconds: float) -> None:
+        """Block the model's bucket after a provider 429 so queued callers back off"""
+        if not self.enabled:
+            return
+        scripts = self._get_scripts()
+        if scripts is not None:
+            try:
+                await scripts[1](keys=[self._key(model)], args=[seconds])
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        rpm, tpm = self.limits(model)
+        self._local.setdefault(model, _LocalBucket(rpm, tpm)).penalize(seconds)
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Optional
+from openai import OpenAI, AsyncOpenAI
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from libs.utils.config import config
+
+def _params_key(params: dict) -> tuple:
+    return tuple(sorted(params.items()))
+
+def _with_loop_client(instance: genai.GenerativeModel) -> genai.GenerativeModel:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return instance
+    # genai shares one gRPC async client process-wide; give each loop its own
+    instance._async_client = genai_client._client_manager.make_client("generative_async")
+    return instance
+
+class ClientRegistry:
+    """
+    Process-wide cache of SDK clients and chat models keyed by (provider, model, params)
+
+    Async clients hold connection pools bound to the event loop that first used
+    them, so those are cached per running loop (one per process in a FastAPI
+    service; one per task in Celery, dropped once the loop is closed). Everything
+    else is shared process-wide.
+    """
+
+    def __init__(self):
+        self._shared: Dict[Hashable, Any] = {}
+        self._per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, Any]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _store(self, loop_bound: bool) -> Dict[Hashable, Any]:
+        if loop_bound:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                if loop not in self._per_loop:
+                    # Clients can reference their loop, so weak keys alone won't free them
+                    for closed in [l for l in self._per_loop if l.is_closed()]:
+                        del self._per_loop[closed]
+                return self._per_loop.setdefault(loop, {})
+        return self._shared
+
+    def get(self, key: Hashable, factory: Callable[[], Any], loop_bound: bool = False) -> Any:
+        """Return the cached object for key, building it once with factory()"""
+        with self._lock:
+            store = self._store(loop_bound)
+            if key not in store:
+                store[key] = factory()
+            return store[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shared.clear()
+            self._per_loop.clear()
+
+    def openai_client(self) -> OpenAI:
+        return self.get(("openai", "sync"), lambda: OpenAI(api_key=config.OPENAI_API_KEY))
+
+    def openai_async_client(self) -> AsyncOpenAI:
+        return self.get(("openai", "async"), lambda: AsyncOpenAI(api_key=config.OPENAI_API_KEY), loop_bound=True)
+
+    def gemini_model(self, model: str, **params) -> genai.GenerativeModel:
+        return self.get(
+            ("gemini", model, _params_key(params)),
+            lambda: _with_loop_client(genai.GenerativeModel(model, **params)),
+            loop_bound=True
+        )
+
+    def gemini_cached_model(self, cached_content) -> genai.GenerativeModel:
+        """GenerativeModel bound to a Gemini CachedContent (its model and system instruction)"""
+        return self.get(
+            ("gemini", "cached", cached_content.name),
+            lambda: _with_loop_client(genai.GenerativeModel.from_cached_content(cached_content)),
+            loop_bound=True
+        )
+
+    def chat_model(self, provider: str, model: str, temperature: Optional[float] = None):
+        """LangChain chat model for provider/model with the given sampling params"""
+        def build():
+            if provider == "gemini":
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                return ChatGoogleGenerativeAI(
+                    model=model,
+                    temperature=temperature,
+                    google_api_key=config.GEMINI_API_KEY
+                )
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                openai_api_key=config.OPENAI_API_KEY
+            )
+        key = ("langchain", provider, model, _params_key({"temperature": temperature}))
+        return self.get(key, build, loop_bound=True)
+
+client_registry = ClientRegistry()
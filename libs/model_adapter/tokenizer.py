@@ -0,0 +1,59 @@
+import math
+from functools import lru_cache
+from typing import Optional
+from libs.utils.logging import setup_logger
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = setup_logger("tokenizer")
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Gemini has no local tokenizer; SentencePiece averages ~4 characters per token
+# for English and close to one token per character for CJK and other non-Latin text
+GEMINI_CHARS_PER_TOKEN = {
+    "gemini-pro": 4.0,
+    "gemini-1.5-pro": 4.0,
+}
+
+@lru_cache(maxsize=None)
+def get_encoding(model: Optional[str] = None):
+    """
+    tiktoken encoding for an OpenAI model, loaded once per model
+    Returns: None if tiktoken is missing or its BPE files can't be loaded (offline)
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, approximating token counts: {e}")
+        return None
+
+def approximate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """Character-class estimate used for Gemini and when tiktoken can't load"""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return math.ceil((len(text) - non_ascii) / chars_per_token) + non_ascii
+
+def count_openai_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return approximate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_gemini_tokens(text: str, model: Optional[str] = None) -> int:
+    return approximate_tokens(text, GEMINI_CHARS_PER_TOKEN.get(model, 4.0))
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Token count for any supported model; cl100k_base when the model is unknown"""
+    if model and model.startswith("gemini"):
+        return count_gemini_tokens(text, model)
+    return count_openai_tokens(text, model)
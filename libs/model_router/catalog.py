@@ -0,0 +1,29 @@
+from typing import NamedTuple, Optional
+
+class ModelSpec(NamedTuple):
+    provider: str
+    model: str
+    tier: int               # 1 = fast/cheap, 2 = high quality
+    context_window: int
+    expected_latency: float # seconds; used until enough calls have been observed
+
+MODEL_CATALOG = [
+    ModelSpec("openai", "gpt-3.5-turbo", 1, 16385, 1.5),
+    ModelSpec("gemini", "gemini-pro", 1, 32760, 2.0),
+    ModelSpec("openai", "gpt-4-turbo", 2, 128000, 6.0),
+    ModelSpec("openai", "gpt-4", 2, 8192, 8.0),
+    ModelSpec("gemini", "gemini-1.5-pro", 2, 1048576, 6.0),
+]
+
+# Minimum quality tier per task type; unlisted task types accept tier 1
+TASK_TIERS = {
+    "summarization": 1,
+    "rag": 1,
+    "query_rewrite": 1,
+}
+
+def get_spec(provider: str, model: str) -> Optional[ModelSpec]:
+    for spec in MODEL_CATALOG:
+        if spec.provider == provider and spec.model == model:
+            return spec
+    return None
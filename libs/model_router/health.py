@@ -0,0 +1,210 @@
+import time
+import asyncio
+import threading
+import numpy as np
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from libs.model_adapter import ModelAdapter, BatchResult
+from libs.model_adapter.rate_limit import RateLimitTimeout, is_rate_limit, retry_after, queue_wait
+from libs.utils.config import config
+from libs.utils.metrics import llm_request_duration_seconds
+
+# SDK exceptions that mean the request never got a proper answer (no HTTP status of their own)
+TRANSPORT_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout", "ReadTimeout",
+    "RemoteProtocolError", "ServiceUnavailable", "DeadlineExceeded"
+}
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status carried by an OpenAI (status_code) or Google API (code) error"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+def is_provider_failure(error: Exception) -> bool:
+    """
+    Transport errors, timeouts, 429 and 5xx: the provider (or the path to it) is
+    struggling. Anything else, such as a 400 for an oversized prompt or a 401, is
+    the caller's problem and says nothing about the model's health.
+    """
+    if isinstance(error, RateLimitTimeout):
+        # Our own rate-limit queue was full; the provider never saw the request
+        return False
+    if is_rate_limit(error):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status >= 500 or status == 408
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in TRANSPORT_ERRORS
+
+def should_fail_over(error: Exception) -> bool:
+    """Worth retrying on another model: a provider failure, or our queue for this one is full"""
+    return isinstance(error, RateLimitTimeout) or is_provider_failure(error)
+
+class ModelHealth:
+    """Rolling latency and error window for one provider/model"""
+
+    def __init__(self, window: int, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)  # (timestamp, ok)
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: Optional[float]) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.outcomes.append((now, True))
+            if latency is not None:
+                self.latencies.append((now, latency))
+
+    def record_abandoned(self, elapsed: float) -> None:
+        """
+        A call cancelled after `elapsed` (hedged away, caller gone) would have taken
+        at least that long. Kept as a latency sample once it reaches the current
+        p95, so slow calls that lose to a hedge still hold the p95 (and the hedge
+        delay) up; shorter ones say nothing about the tail and are dropped.
+        """
+        p95 = self.percentile(95)
+        if p95 is None or elapsed < p95:
+            return
+        with self._lock:
+            self.latencies.append((time.monotonic(), elapsed))
+
+    def record_failure(self, cooldown: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.outcomes.append((now, False))
+            if cooldown:
+                self.cooldown_until = max(self.cooldown_until, now + cooldown)
+
+    def _recent(self, samples: deque) -> list:
+        cutoff = time.monotonic() - self.window_seconds
+        return [s for s in samples if s[0] >= cutoff]
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Returns: latency percentile in seconds, or None below the minimum sample count"""
+        with self._lock:
+            recent = [latency for _, latency in self._recent(self.latencies)]
+        if len(recent) < config.ROUTER_MIN_SAMPLES:
+            return None
+        return float(np.percentile(recent, p))
+
+    def error_rate(self) -> Optional[float]:
+        with self._lock:
+            recent = self._recent(self.outcomes)
+        if len(recent) < config.ROUTER_MIN_SAMPLES:
+            return None
+        return sum(1 for _, ok in recent if not ok) / len(recent)
+
+    def rate_limited(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def healthy(self) -> bool:
+        if self.rate_limited():
+            return False
+        errors = self.error_rate()
+        return errors is None or errors <= config.ROUTER_MAX_ERROR_RATE
+
+class HealthTracker:
+    """Per-(provider, model) health shared by every request in the process"""
+
+    def __init__(self, window: Optional[int] = None, window_seconds: Optional[float] = None):
+        self.window = window or config.ROUTER_HEALTH_WINDOW
+        self.window_seconds = window_seconds or config.ROUTER_HEALTH_WINDOW_SECONDS
+        self._models: Dict[Tuple[str, str], ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str) -> ModelHealth:
+        key = (provider, model)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = ModelHealth(self.window, self.window_seconds)
+            return self._models[key]
+
+    def record_error(self, provider: str, model: str, error: Exception) -> None:
+        if not is_provider_failure(error):
+            return
+        cooldown = None
+        if is_rate_limit(error):
+            cooldown = retry_after(error) or config.ROUTER_RATE_LIMIT_COOLDOWN_SECONDS
+        self.get(provider, model).record_failure(cooldown)
+
+class TrackedModelAdapter(ModelAdapter):
+    """
+    Records upstream latency and failures into a HealthTracker
+    Sits below the response cache so only real provider calls are measured;
+    time queued in the client-side rate limiter is not counted as latency.
+    """
+
+    def __init__(self, adapter: ModelAdapter, provider: str, tracker: HealthTracker):
+        self.adapter = adapter
+        self.provider = provider
+        self.tracker = tracker
+
+    async def complete(
+        self,
+        prompt: str,
+        model: str,
+        stream: bool = False,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None
+    ) -> Union[str, AsyncIterator[str]]:
+        health = self.tracker.get(self.provider, model)
+        queue_wait.set(0.0)
+        start = time.perf_counter()
+        try:
+            response = await self.adapter.complete(
+                prompt, model, stream, temperature=temperature, max_tokens=max_tokens, system_prompt=system_prompt
+            )
+        except asyncio.CancelledError:
+            if not stream:
+                health.record_abandoned(time.perf_counter() - start - queue_wait.get())
+            raise
+        except Exception as e:
+            self.tracker.record_error(self.provider, model, e)
+            raise
+
+        if not stream:
+            latency = max(time.perf_counter() - start - queue_wait.get(), 0.0)
+            llm_request_duration_seconds.labels(provider=self.provider, model=model).observe(latency)
+            health.record_success(latency)
+            return response
+
+        # Stream durations depend on output length, so only their outcome feeds health
+        async def tracked():
+            try:
+                async for chunk in response:
+                    yield chunk
+            except Exception as e:
+                self.tracker.record_error(self.provider, model, e)
+                raise
+            health.record_success(None)
+        return tracked()
+
+    async def complete_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        use_batch_api: bool = False,
+        system_prompt: Optional[str] = None
+    ) -> List[BatchResult]:
+        if use_batch_api:
+            # Batch jobs run for hours and say nothing about interactive latency
+            return await self.adapter.complete_batch(
+                prompts, model, temperature, max_tokens, concurrency, use_batch_api, system_prompt=system_prompt
+            )
+        return await super().complete_batch(
+            prompts, model, temperature, max_tokens, concurrency, system_prompt=system_prompt
+        )
+
+    def estimate_cost(self, input_tokens: int, output_tokens: int, model: str, cached_tokens: int = 0) -> float:
+        return self.adapter.estimate_cost(input_tokens, output_tokens, model, cached_tokens)
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        return self.adapter.count_tokens(text, model)
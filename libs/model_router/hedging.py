@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Optional
+from libs.utils.config import config
+
+class HedgeBudget:
+    """
+    Token bucket that caps hedges at a fraction of traffic
+    Every eligible request earns `ratio` tokens (up to `burst`); each hedge spends one.
+    """
+
+    def __init__(self, ratio: Optional[float] = None, burst: Optional[float] = None):
+        self.ratio = config.ROUTER_HEDGE_BUDGET if ratio is None else ratio
+        self.burst = config.ROUTER_HEDGE_BURST if burst is None else burst
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+async def hedged(
+    primary: Callable[[], Awaitable[Any]],
+    backup: Callable[[], Awaitable[Any]],
+    delay: float,
+    budget: HedgeBudget
+) -> tuple:
+    """
+    Start primary(); if it hasn't finished after `delay`, start backup() and take
+    whichever succeeds first, cancelling the other
+    Returns: (result, outcome) where outcome is "none" if primary beat the delay,
+    else "primary", "hedge" or "budget_exhausted"
+    """
+    budget.deposit()
+    first = asyncio.ensure_future(primary())
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result(), "none"
+        if not budget.try_acquire():
+            return await first, "budget_exhausted"
+
+        second = asyncio.ensure_future(backup())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), "primary" if task is first else "hedge"
+                    error = task.exception()
+            raise error
+        finally:
+            second.cancel()
+    finally:
+        first.cancel()
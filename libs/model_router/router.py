@@ -1,19 +1,43 @@
-from typing import Optional
-from libs.model_adapter import OpenAIAdapter, GeminiAdapter
+from typing import List, Optional
+from libs.model_adapter import OpenAIAdapter, GeminiAdapter, ResponseCache, CachedModelAdapter, BatchResult, count_tokens
+from libs.utils.config import config
+from libs.utils.logging import setup_logger
+from libs.utils.metrics import llm_coalesced_requests_total, llm_routing_decisions_total, llm_hedged_requests_total
+from .catalog import MODEL_CATALOG, TASK_TIERS, get_spec
+from .health import HealthTracker, TrackedModelAdapter, should_fail_over
+from .hedging import HedgeBudget, hedged
+from .singleflight import SingleFlight
+
+logger = setup_logger("model-router")
 
 class ModelRouter:
     def __init__(self):
-        self.openai_adapter = OpenAIAdapter()
-        self.gemini_adapter = GeminiAdapter()
-    
-    def select_model(
+        self.health = HealthTracker()
+        response_cache = ResponseCache()
+        self.openai_adapter = CachedModelAdapter(
+            TrackedModelAdapter(OpenAIAdapter(), "openai", self.health), "openai", response_cache
+        )
+        self.gemini_adapter = CachedModelAdapter(
+            TrackedModelAdapter(GeminiAdapter(), "gemini", self.health), "gemini", response_cache
+        )
+        self.singleflight = SingleFlight()
+        self.hedge_budget = HedgeBudget()
+
+    def get_adapter(self, provider: str):
+        if provider == "openai":
+            return self.openai_adapter
+        elif provider == "gemini":
+            return self.gemini_adapter
+        raise ValueError(f"Unknown provider: {provider}")
+
+    def preferred_model(
         self,
         task_type: Optional[str] = None,
         user_preference: Optional[str] = None,
         context_length: int = 0
     ) -> tuple[str, str]:
         """
-        Select appropriate model and provider
+        Static choice used when every candidate is healthy and comparably fast
         Returns: (provider, model_name)
         """
         # Explicit user preference
@@ -22,7 +46,7 @@ class ModelRouter:
                 return ("openai", user_preference)
             elif "gemini" in user_preference.lower():
                 return ("gemini", user_preference)
-        
+
         # Automatic routing based on task type
         if task_type == "summarization":
             return ("gemini", "gemini-pro")  # Cost-effective
@@ -30,23 +54,207 @@ class ModelRouter:
             return ("openai", "gpt-4-turbo")  # Large context
         else:
             return ("openai", "gpt-3.5-turbo")  # Fast and cheap
-    
+
+    def route(
+        self,
+        task_type: Optional[str] = None,
+        user_preference: Optional[str] = None,
+        context_length: int = 0
+    ) -> List[tuple[str, str]]:
+        """
+        Rank candidate models: healthy before degraded, the task's own tier before
+        higher tiers, then by observed p95 latency. An automatically preferred
+        model keeps its place unless another is ROUTER_PREFERENCE_MARGIN times
+        faster; a model the user asked for stays first while it is healthy.
+        Returns: [(provider, model_name), ...] in failover order
+        """
+        preferred = self.preferred_model(task_type, user_preference, context_length)
+        preferred_spec = get_spec(*preferred)
+        explicit = bool(user_preference) and preferred[1] == user_preference
+        required_tier = max(TASK_TIERS.get(task_type, 1), preferred_spec.tier if preferred_spec else 1)
+
+        candidates = [preferred] + [
+            (spec.provider, spec.model) for spec in MODEL_CATALOG
+            if spec.tier >= required_tier
+            and spec.context_window >= context_length
+            and (spec.provider, spec.model) != preferred
+        ]
+
+        def rank(candidate):
+            spec = get_spec(*candidate)
+            health = self.health.get(*candidate)
+            latency = health.percentile(95)
+            if latency is None:
+                latency = spec.expected_latency if spec else 0.0
+            if candidate == preferred:
+                latency /= config.ROUTER_PREFERENCE_MARGIN
+            tier = spec.tier if spec else required_tier
+            pinned = explicit and candidate == preferred
+            return (not health.healthy(), not pinned, tier - required_tier, latency)
+
+        return sorted(candidates, key=rank)
+
+    def select_model(
+        self,
+        task_type: Optional[str] = None,
+        user_preference: Optional[str] = None,
+        context_length: int = 0
+    ) -> tuple[str, str]:
+        """
+        Select appropriate model and provider
+        Returns: (provider, model_name)
+        """
+        return self.route(task_type, user_preference, context_length)[0]
+
     async def complete(
         self,
         prompt: str,
         task_type: Optional[str] = None,
         user_preference: Optional[str] = None,
         context_length: int = 0,
-        stream: bool = False
+        stream: bool = False,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        coalesce: bool = True,
+        hedge: bool = False,
+        system_prompt: Optional[str] = None
     ):
-        """Route request to appropriate model"""
-        provider, model = self.select_model(task_type, user_preference, context_length)
+        """
+        Route request to the best available model, failing over on upstream errors
+        Identical concurrent requests share one upstream call unless coalesce=False.
+        With hedge=True a non-streaming call that outlives the model's observed p95
+        gets a backup request, within the ROUTER_HEDGE_BUDGET share of traffic.
+        Put static instructions in system_prompt so providers can cache that prefix.
+        """
+        if not context_length:
+            # The window has to hold the prompt and the completion
+            context_length = count_tokens(prompt) + (max_tokens or 0)
+            if system_prompt:
+                context_length += count_tokens(system_prompt)
         
-        if provider == "openai":
-            return await self.openai_adapter.complete(prompt, model, stream)
-        elif provider == "gemini":
-            return await self.gemini_adapter.complete(prompt, model, stream)
+        preferred = self.preferred_model(task_type, user_preference, context_length)
+        candidates = self.route(task_type, user_preference, context_length)[:max(config.ROUTER_MAX_ATTEMPTS, 1)]
+
+        for attempt, (provider, model) in enumerate(candidates):
+            if attempt > 0:
+                reason = "error_failover"
+            elif (provider, model) == preferred:
+                reason = "preferred"
+            elif self.health.get(*preferred).healthy():
+                reason = "latency"
+            else:
+                reason = "degraded_failover"
+            llm_routing_decisions_total.labels(provider=provider, model=model, reason=reason).inc()
+
+            try:
+                if hedge and attempt == 0 and not stream:
+                    return await self._complete_hedged(
+                        candidates, prompt, task_type, temperature, max_tokens, coalesce, system_prompt
+                    )
+                return await self._complete_on(
+                    provider, model, prompt, task_type, stream, temperature, max_tokens, coalesce, system_prompt
+                )
+            except Exception as e:
+                # Caller errors (bad request, context too long, auth) would fail on every model
+                if attempt == len(candidates) - 1 or not should_fail_over(e):
+                    raise
+                logger.warning(f"{provider}/{model} failed ({type(e).__name__}), failing over")
+
+    async def complete_batch(
+        self,
+        prompts: List[str],
+        task_type: Optional[str] = None,
+        user_preference: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        use_batch_api: bool = False,
+        system_prompt: Optional[str] = None
+    ) -> List[BatchResult]:
+        """
+        Complete many prompts for throughput jobs, in order, with per-item errors
+        Items that fail on the routed model are retried once on the next candidate.
+        use_batch_api submits to the provider's batch endpoint where one exists.
+        """
+        context_length = max((count_tokens(prompt) for prompt in prompts), default=0) + (max_tokens or 0)
+        if system_prompt:
+            context_length += count_tokens(system_prompt)
+        candidates = self.route(task_type, user_preference, context_length)[:max(config.ROUTER_MAX_ATTEMPTS, 1)]
+
+        results: List[Optional[BatchResult]] = [None] * len(prompts)
+        pending = list(range(len(prompts)))
+        for attempt, (provider, model) in enumerate(candidates):
+            reason = "batch" if attempt == 0 else "error_failover"
+            llm_routing_decisions_total.labels(provider=provider, model=model, reason=reason).inc()
+
+            batch = await self.get_adapter(provider).complete_batch(
+                [prompts[i] for i in pending], model,
+                temperature=temperature, max_tokens=max_tokens, concurrency=concurrency,
+                use_batch_api=use_batch_api, system_prompt=system_prompt, task_type=task_type
+            )
+            for i, result in zip(pending, batch):
+                results[i] = result._replace(model=model) if result.ok else result
+            pending = [i for i in pending if not results[i].ok and should_fail_over(results[i].error)]
+            if not pending:
+                break
+            logger.warning(f"{len(pending)} batch items failed on {provider}/{model}")
+
+        return results
+
+    async def _complete_hedged(self, candidates, prompt, task_type, temperature, max_tokens, coalesce, system_prompt=None):
+        provider, model = candidates[0]
+        delay = self.health.get(provider, model).percentile(95)
+        if delay is None:
+            # No latency history yet, so there is no p95 to hedge against
+            return await self._complete_on(
+                provider, model, prompt, task_type, False, temperature, max_tokens, coalesce, system_prompt
+            )
+
+        backup_provider, backup_model = provider, model
+        if config.ROUTER_HEDGE_ALTERNATE:
+            for candidate in candidates[1:]:
+                if self.health.get(*candidate).healthy():
+                    backup_provider, backup_model = candidate
+                    break
+
+        result, outcome = await hedged(
+            lambda: self._complete_on(
+                provider, model, prompt, task_type, False, temperature, max_tokens, coalesce, system_prompt
+            ),
+            # Never coalesce the backup: it would just join the primary's in-flight call
+            lambda: self._complete_on(
+                backup_provider, backup_model, prompt, task_type, False, temperature, max_tokens, False, system_prompt
+            ),
+            delay,
+            self.hedge_budget
+        )
+        if outcome != "none":
+            winner = (backup_provider, backup_model) if outcome == "hedge" else (provider, model)
+            llm_hedged_requests_total.labels(provider=winner[0], model=winner[1], outcome=outcome).inc()
+        return result
+
+    async def _complete_on(
+        self, provider, model, prompt, task_type, stream, temperature, max_tokens, coalesce, system_prompt=None
+    ):
+        adapter = self.get_adapter(provider)
+
+        def call():
+            return adapter.complete(
+                prompt, model, stream,
+                temperature=temperature, max_tokens=max_tokens, system_prompt=system_prompt, task_type=task_type
+            )
+
+        if not coalesce:
+            return await call()
+
+        key = (provider, model, system_prompt, prompt, temperature, max_tokens)
+        if stream:
+            result, shared = await self.singleflight.stream(key, call)
         else:
-            raise ValueError(f"Unknown provider: {provider}")
+            result, shared = await self.singleflight.do(key, call)
+
+        if shared:
+            llm_coalesced_requests_total.labels(provider=provider, model=model).inc()
+        return result
 
 model_router = ModelRouter()
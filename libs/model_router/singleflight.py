@@ -0,0 +1,134 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+class _Call:
+    """One in-flight upstream completion shared by every identical waiter"""
+
+    def __init__(self, key: Hashable, task: asyncio.Task):
+        self.key = key
+        self.task = task
+        self.waiters = 0
+
+class _Stream:
+    """One in-flight upstream stream; chunks are buffered so late joiners replay from the start"""
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.opened: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.changed = asyncio.Event()
+        self.pump: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls onto one upstream request
+    Completed calls are forgotten immediately; this is not a cache.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Stream] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once per key no matter how many callers arrive while it runs
+        Returns: (result, shared) where shared is True for coalesced waiters
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(key, asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, call))
+
+        call.waiters += 1
+        try:
+            # Shield so one cancelled waiter doesn't cancel the call for everyone else
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to receive the result; don't let newcomers join a cancelled call
+                self._forget(self._calls, call)
+                call.task.cancel()
+
+    async def stream(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[AsyncIterator[str]]]
+    ) -> tuple:
+        """
+        Open fn()'s stream once per key and fan chunks out to every subscriber
+        Returns: (async iterator of chunks, shared)
+        """
+        flight = self._streams.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Stream(key)
+            self._streams[key] = flight
+            flight.pump = asyncio.ensure_future(self._pump(flight, fn))
+            flight.pump.add_done_callback(lambda _: self._forget(self._streams, flight))
+
+        flight.subscribers += 1
+        try:
+            # Surface errors opening the stream to the caller, like a direct adapter call
+            await asyncio.shield(flight.opened)
+        except BaseException:
+            self._unsubscribe(flight)
+            raise
+        return self._subscribe(flight), shared
+
+    @staticmethod
+    async def _pump(flight: _Stream, fn) -> None:
+        try:
+            iterator = await fn()
+            flight.opened.set_result(None)
+            async for chunk in iterator:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            if not flight.opened.done():
+                flight.opened.cancel()
+            raise
+        except Exception as e:
+            flight.error = e
+            if not flight.opened.done():
+                flight.opened.set_exception(e)
+                # Mark retrieved so asyncio doesn't warn when no subscriber is left to see it
+                flight.opened.exception()
+        finally:
+            flight.done = True
+            flight.notify()
+
+    async def _subscribe(self, flight: _Stream) -> AsyncIterator[str]:
+        position = 0
+        try:
+            while True:
+                while position < len(flight.chunks):
+                    yield flight.chunks[position]
+                    position += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.changed.wait()
+        finally:
+            self._unsubscribe(flight)
+
+    def _unsubscribe(self, flight: _Stream) -> None:
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and flight.pump and not flight.pump.done():
+            self._forget(self._streams, flight)
+            flight.pump.cancel()
+
+    @staticmethod
+    def _forget(table: dict, flight) -> None:
+        if table.get(flight.key) is flight:
+            del table[flight.key]
@@ -0,0 +1,21 @@
+from .context import fetch_neighbors, expand_neighbors
+from .embeddings import EmbeddingProvider, set_embedding_provider, embed_texts, aembed_texts, embed_query
+from .filters import SearchFilters, resolve_filters
+from .prompts import CHAT_SYSTEM_PROMPT, RAG_SYSTEM_PROMPT, QUERY_REWRITE_SYSTEM_PROMPT, build_rag_prompt, build_rewrite_prompt
+
+__all__ = [
+    "fetch_neighbors",
+    "expand_neighbors",
+    "EmbeddingProvider",
+    "set_embedding_provider",
+    "embed_texts",
+    "aembed_texts",
+    "embed_query",
+    "SearchFilters",
+    "resolve_filters",
+    "CHAT_SYSTEM_PROMPT",
+    "RAG_SYSTEM_PROMPT",
+    "QUERY_REWRITE_SYSTEM_PROMPT",
+    "build_rag_prompt",
+    "build_rewrite_prompt"
+]
@@ -0,0 +1,85 @@
+import aiosqlite
+from typing import List, Dict
+
+# Pulls every hit plus up to `window` preceding/following chunks of the same
+# document in a single statement. Each side is a correlated ORDER BY offset
+# LIMIT window subquery, so it is a bounded walk of the (doc_id, offset) index
+# from the hit rather than a read of the whole document.
+NEIGHBOR_QUERY = """
+    WITH hits AS (
+        SELECT id, doc_id, offset FROM chunks WHERE id IN ({placeholders})
+    )
+    SELECT h.id, c.id, c.text, c.offset
+    FROM hits h JOIN chunks c ON c.id = h.id
+    UNION ALL
+    SELECT h.id, c.id, c.text, c.offset
+    FROM hits h JOIN chunks c ON c.id IN (
+        SELECT p.id FROM chunks p
+        WHERE p.doc_id = h.doc_id AND p.offset < h.offset
+        ORDER BY p.offset DESC LIMIT ?
+    )
+    UNION ALL
+    SELECT h.id, c.id, c.text, c.offset
+    FROM hits h JOIN chunks c ON c.id IN (
+        SELECT n.id FROM chunks n
+        WHERE n.doc_id = h.doc_id AND n.offset > h.offset
+        ORDER BY n.offset LIMIT ?
+    )
+    ORDER BY 1, 4
+"""
+
+async def fetch_neighbors(
+    conn: aiosqlite.Connection,
+    chunk_ids: List[str],
+    window: int = 1
+) -> Dict[str, List[tuple]]:
+    """
+    Fetch adjacent chunks for each hit in one batched query
+    Returns: {hit_chunk_id: [(chunk_id, text), ...]} ordered by offset
+    """
+    if not chunk_ids:
+        return {}
+
+    placeholders = ','.join('?' * len(chunk_ids))
+    cursor = await conn.execute(
+        NEIGHBOR_QUERY.format(placeholders=placeholders),
+        (*chunk_ids, window, window)
+    )
+    rows = await cursor.fetchall()
+
+    neighbors: Dict[str, List[tuple]] = {}
+    for hit_id, chunk_id, text, _ in rows:
+        neighbors.setdefault(hit_id, []).append((chunk_id, text))
+    return neighbors
+
+async def expand_neighbors(
+    conn: aiosqlite.Connection,
+    results: List[dict],
+    window: int = 1
+) -> List[dict]:
+    """
+    Attach a `context` field to each search result containing the hit and its
+    neighboring chunks. Chunks already included for a higher-ranked hit are not
+    repeated, so adjacent hits don't duplicate text in the prompt.
+    """
+    chunk_ids = [r['metadata'].get('chunk_id') for r in results if r.get('metadata')]
+    neighbors = await fetch_neighbors(conn, [c for c in chunk_ids if c], window)
+
+    seen = set()
+    for result in results:
+        chunk_id = (result.get('metadata') or {}).get('chunk_id')
+        span = neighbors.get(chunk_id)
+        if not span:
+            result['context'] = result['text']
+            seen.add(chunk_id)
+            continue
+
+        parts = []
+        for neighbor_id, text in span:
+            if neighbor_id in seen and neighbor_id != chunk_id:
+                continue
+            seen.add(neighbor_id)
+            parts.append(text)
+        result['context'] = "\n".join(parts)
+
+    return results
@@ -0,0 +1,45 @@
+from openai import OpenAI, AsyncOpenAI
+from typing import List, Optional
+from libs.model_adapter.registry import client_registry
+from libs.utils.config import config
+
+class EmbeddingProvider:
+    """OpenAI embeddings with the model used for every stored vector"""
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or config.EMBEDDING_MODEL
+
+    @property
+    def client(self) -> OpenAI:
+        return client_registry.openai_client()
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return client_registry.openai_async_client()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in response.data]
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.async_client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in response.data]
+
+embedding_provider = EmbeddingProvider()
+
+def set_embedding_provider(provider: EmbeddingProvider) -> None:
+    """Swap the process-wide provider (benchmarks and offline runs use stubs)"""
+    global embedding_provider
+    embedding_provider = provider
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed chunk texts for indexing"""
+    return embedding_provider.embed(texts)
+
+async def aembed_texts(texts: List[str]) -> List[List[float]]:
+    """embed_texts for callers on an event loop"""
+    return await embedding_provider.aembed(texts)
+
+async def embed_query(text: str) -> List[float]:
+    """Embed a search query with the same model used at ingestion time"""
+    return (await embedding_provider.aembed([text]))[0]
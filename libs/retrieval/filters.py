@@ -0,0 +1,54 @@
+import aiosqlite
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
+
+class SearchFilters(BaseModel):
+    doc_ids: Optional[List[str]] = None
+    filename: Optional[str] = None
+    uploaded_after: Optional[str] = None
+    uploaded_before: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not (self.doc_ids or self.filename or self.uploaded_after or self.uploaded_before)
+
+async def resolve_filters(
+    conn: aiosqlite.Connection,
+    collection_id: str,
+    filters: SearchFilters
+) -> Tuple[List[str], int]:
+    """
+    Resolve document filters against SQLite
+    Returns: (matching doc_ids, number of chunks under those documents)
+    """
+    clauses = ["d.collection_id = ?"]
+    params: list = [collection_id]
+
+    if filters.doc_ids:
+        clauses.append(f"d.id IN ({','.join('?' * len(filters.doc_ids))})")
+        params.extend(filters.doc_ids)
+    if filters.filename:
+        escaped = filters.filename.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        clauses.append("d.filename LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    if filters.uploaded_after:
+        clauses.append("d.created_at >= datetime(?)")
+        params.append(filters.uploaded_after)
+    if filters.uploaded_before:
+        clauses.append("d.created_at < datetime(?)")
+        params.append(filters.uploaded_before)
+
+    cursor = await conn.execute(
+        f"""
+        SELECT d.id, COUNT(c.id)
+        FROM documents d
+        LEFT JOIN chunks c ON c.doc_id = d.id
+        WHERE {' AND '.join(clauses)}
+        GROUP BY d.id
+        """,
+        params
+    )
+    rows = await cursor.fetchall()
+
+    doc_ids = [row[0] for row in rows]
+    chunk_count = sum(row[1] for row in rows)
+    return doc_ids, chunk_count
@@ -0,0 +1,35 @@
+from typing import List
+
+# Static preamble sent as the system prompt. It comes first and never varies,
+# so providers with prompt caching can reuse it across RAG requests; the
+# per-request context and question follow in the user prompt.
+RAG_SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided context.
+
+Based on the context in the user's message, answer the question. If the context does not contain the answer, say so."""
+
+# Opens every chat session's history, whether created through the API or
+# reloaded from the gateway database
+CHAT_SYSTEM_PROMPT = "You are a helpful AI assistant. Provide clear, accurate, and friendly responses."
+
+QUERY_REWRITE_SYSTEM_PROMPT = """You rewrite the latest message of a conversation into a standalone search query.
+
+Resolve pronouns and references to earlier messages so the query makes sense on its own. Keep names, numbers and technical terms. Reply with the query only."""
+
+def build_rag_prompt(context: str, query: str) -> str:
+    """User prompt for a RAG answer; pair with RAG_SYSTEM_PROMPT"""
+    return f"""Context:
+{context}
+
+Question: {query}
+
+Answer:"""
+
+def build_rewrite_prompt(history: List[dict], message: str) -> str:
+    """User prompt for a query rewrite; pair with QUERY_REWRITE_SYSTEM_PROMPT"""
+    conversation = "\n".join(f"{m['role']}: {m['content']}" for m in history)
+    return f"""Conversation:
+{conversation}
+
+Latest message: {message}
+
+Standalone query:"""
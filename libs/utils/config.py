@@ -8,6 +8,9 @@ load_dotenv()
 class Config:
     # Database
     SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "./data/astraflow.db")
+    # API gateway: read-only connections serving SELECTs beside the single writer
+    SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
     
     # Redis
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -22,6 +25,94 @@ class Config:
     CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
     CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
     
+    # Vector store backend: "chroma" (HTTP server) or "local" (in-process, persisted to disk)
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+    VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "./data/vectors")
+    LOCAL_HNSW_MIN_VECTORS = int(os.getenv("LOCAL_HNSW_MIN_VECTORS", "50000"))
+    
+    # Quantized collections (local backend): candidates re-scored per result, PQ layout
+    QUANTIZATION_RESCORE_FACTOR = int(os.getenv("QUANTIZATION_RESCORE_FACTOR", "10"))
+    PQ_SUBVECTORS = int(os.getenv("PQ_SUBVECTORS", "96"))
+    PQ_TRAIN_SIZE = int(os.getenv("PQ_TRAIN_SIZE", "10000"))
+    
+    # Retrieval
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    EXACT_SEARCH_MAX_CHUNKS = int(os.getenv("EXACT_SEARCH_MAX_CHUNKS", "2000"))
+    # Largest neighbor_window accepted by the search endpoints (chunks on each side of a hit)
+    MAX_NEIGHBOR_WINDOW = int(os.getenv("MAX_NEIGHBOR_WINDOW", "5"))
+    
+    # LLM response cache (Redis): temperature-0 requests and these task types are cached
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    LLM_CACHE_MAX_ENTRY_BYTES = int(os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", "65536"))
+    LLM_CACHE_TASK_TYPES = set(filter(None, os.getenv("LLM_CACHE_TASK_TYPES", "summarization").split(",")))
+    # After a Redis error the cache is bypassed for this long before retrying Redis
+    LLM_CACHE_REDIS_RETRY_SECONDS = float(os.getenv("LLM_CACHE_REDIS_RETRY_SECONDS", "30"))
+    
+    # Client-side rate limits per provider (requests/min, tokens/min), shared through Redis;
+    # *_RATE_LIMITS overrides per model as "model=rpm:tpm,..."
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "60"))
+    RATE_LIMIT_DEFAULT_OUTPUT_TOKENS = int(os.getenv("RATE_LIMIT_DEFAULT_OUTPUT_TOKENS", "500"))
+    RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_SECONDS", "5"))
+    # After a Redis error the limiter uses per-process buckets for this long before retrying Redis
+    RATE_LIMIT_REDIS_RETRY_SECONDS = float(os.getenv("RATE_LIMIT_REDIS_RETRY_SECONDS", "30"))
+    OPENAI_RPM = int(os.getenv("OPENAI_RPM", "3500"))
+    OPENAI_TPM = int(os.getenv("OPENAI_TPM", "90000"))
+    OPENAI_RATE_LIMITS = os.getenv("OPENAI_RATE_LIMITS", "")
+    GEMINI_RPM = int(os.getenv("GEMINI_RPM", "360"))
+    GEMINI_TPM = int(os.getenv("GEMINI_TPM", "120000"))
+    GEMINI_RATE_LIMITS = os.getenv("GEMINI_RATE_LIMITS", "")
+    
+    # Batch completions (offline jobs): concurrent calls, OpenAI Batch API poll interval
+    LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+    LLM_BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "30"))
+    
+    # Chat sessions: "redis" (shared by replicas, LRU hot cache in front) or "memory";
+    # sessions expire after CHAT_SESSION_TTL_SECONDS without activity
+    CHAT_SESSION_BACKEND = os.getenv("CHAT_SESSION_BACKEND", "redis")
+    CHAT_SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL_SECONDS", "604800"))
+    CHAT_SESSION_CACHE_SIZE = int(os.getenv("CHAT_SESSION_CACHE_SIZE", "1000"))
+    # Most recent messages loaded from the gateway database when a session isn't cached
+    CHAT_HISTORY_LOAD_LIMIT = int(os.getenv("CHAT_HISTORY_LOAD_LIMIT", "200"))
+    
+    # Chat memory: recent turns sent verbatim within a token budget; older turns are
+    # folded into a rolling summary once CHAT_MEMORY_SUMMARY_BATCH messages have left the window
+    CHAT_MEMORY_MAX_TURNS = int(os.getenv("CHAT_MEMORY_MAX_TURNS", "10"))
+    CHAT_MEMORY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "3000"))
+    CHAT_MEMORY_SUMMARY_BATCH = int(os.getenv("CHAT_MEMORY_SUMMARY_BATCH", "6"))
+    CHAT_MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_MEMORY_SUMMARY_MAX_TOKENS", "400"))
+    # Chat completions: overall limit per turn, and the longest wait for the next streamed chunk
+    CHAT_REQUEST_TIMEOUT_SECONDS = float(os.getenv("CHAT_REQUEST_TIMEOUT_SECONDS", "60"))
+    CHAT_STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("CHAT_STREAM_IDLE_TIMEOUT_SECONDS", "20"))
+    # Collection-bound chat: chunks retrieved per search, turns of history used to rewrite
+    # follow-ups into standalone queries, and when the previous turn's chunks are reused
+    # (query similarity to the search that fetched them, at most CHAT_RAG_MAX_REUSE turns in a row)
+    CHAT_RAG_TOP_K = int(os.getenv("CHAT_RAG_TOP_K", "5"))
+    CHAT_RAG_REWRITE_TURNS = int(os.getenv("CHAT_RAG_REWRITE_TURNS", "3"))
+    CHAT_RAG_REUSE_SIMILARITY = float(os.getenv("CHAT_RAG_REUSE_SIMILARITY", "0.85"))
+    CHAT_RAG_MAX_REUSE = int(os.getenv("CHAT_RAG_MAX_REUSE", "3"))
+    
+    # Gemini explicit context caching for long system prompts (the API minimum is 32k tokens)
+    GEMINI_CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "32768"))
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+    
+    # Model routing: rolling health window per model and failover thresholds
+    ROUTER_HEALTH_WINDOW = int(os.getenv("ROUTER_HEALTH_WINDOW", "200"))
+    ROUTER_HEALTH_WINDOW_SECONDS = float(os.getenv("ROUTER_HEALTH_WINDOW_SECONDS", "120"))
+    ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+    ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+    ROUTER_RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("ROUTER_RATE_LIMIT_COOLDOWN_SECONDS", "30"))
+    ROUTER_PREFERENCE_MARGIN = float(os.getenv("ROUTER_PREFERENCE_MARGIN", "1.5"))
+    ROUTER_MAX_ATTEMPTS = int(os.getenv("ROUTER_MAX_ATTEMPTS", "2"))
+    
+    # Hedged requests (opt-in per call): share of traffic allowed to hedge, burst allowance
+    ROUTER_HEDGE_BUDGET = float(os.getenv("ROUTER_HEDGE_BUDGET", "0.1"))
+    ROUTER_HEDGE_BURST = float(os.getenv("ROUTER_HEDGE_BURST", "10"))
+    ROUTER_HEDGE_ALTERNATE = os.getenv("ROUTER_HEDGE_ALTERNATE", "true").lower() == "true"
+    
     # Kafka
     KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
     
@@ -49,5 +140,18 @@ class Config:
     STOCK_PRODUCER_PORT = int(os.getenv("STOCK_PRODUCER_PORT", "8005"))
     STOCK_ANALYSIS_PORT = int(os.getenv("STOCK_ANALYSIS_PORT", "8006"))
     GITHUB_ANALYSIS_PORT = int(os.getenv("GITHUB_ANALYSIS_PORT", "8087"))
+    
+    # Upstreams called by the API gateway. The chat timeout outlasts chat service's
+    # own CHAT_REQUEST_TIMEOUT_SECONDS, so it answers 504 first
+    CHAT_SERVICE_URL = os.getenv("CHAT_SERVICE_URL", "http://localhost:8090")
+    STOCK_PRODUCER_URL = os.getenv("STOCK_PRODUCER_URL", "http://localhost:8085")
+    CHAT_SERVICE_TIMEOUT_SECONDS = float(os.getenv("CHAT_SERVICE_TIMEOUT_SECONDS", "65"))
+    STOCK_PRODUCER_TIMEOUT_SECONDS = float(os.getenv("STOCK_PRODUCER_TIMEOUT_SECONDS", "10"))
+    UPSTREAM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_SECONDS", "5"))
+    UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    # Circuit breaker: consecutive failures before an upstream is skipped, and for how long
+    UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+    UPSTREAM_BREAKER_RESET_SECONDS = float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30"))
 
 config = Config()
@@ -15,6 +15,18 @@ http_request_duration_seconds = Histogram(
     ['method', 'endpoint']
 )
 
+upstream_requests_total = Counter(
+    'upstream_requests_total',
+    'API gateway calls to backend services by outcome (ok, error, rejected by open circuit)',
+    ['upstream', 'outcome']
+)
+
+upstream_circuit_open = Gauge(
+    'upstream_circuit_open',
+    'Whether the circuit breaker for a backend service is open',
+    ['upstream']
+)
+
 # Celery Metrics
 celery_task_duration_seconds = Histogram(
     'celery_task_duration_seconds',
@@ -32,9 +44,59 @@ llm_api_calls_total = Counter(
 llm_tokens_used_total = Counter(
     'llm_tokens_used_total',
     'Total tokens used',
+    ['provider', 'model', 'token_type']
+)
+
+llm_cached_tokens_total = Counter(
+    'llm_cached_tokens_total',
+    'Input tokens served from the provider prompt cache (a subset of input tokens)',
+    ['provider', 'model']
+)
+
+llm_coalesced_requests_total = Counter(
+    'llm_coalesced_requests_total',
+    'LLM requests served by joining an identical in-flight call',
+    ['provider', 'model']
+)
+
+llm_cache_requests_total = Counter(
+    'llm_cache_requests_total',
+    'LLM response cache lookups',
+    ['provider', 'model', 'result']
+)
+
+llm_request_duration_seconds = Histogram(
+    'llm_request_duration_seconds',
+    'Upstream LLM completion latency (non-streaming)',
+    ['provider', 'model'],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+)
+
+llm_routing_decisions_total = Counter(
+    'llm_routing_decisions_total',
+    'Model routing decisions',
+    ['provider', 'model', 'reason']
+)
+
+llm_hedged_requests_total = Counter(
+    'llm_hedged_requests_total',
+    'Hedging-enabled LLM requests that outlived the p95 delay, by which call answered',
+    ['provider', 'model', 'outcome']
+)
+
+llm_rate_limit_queue_depth = Gauge(
+    'llm_rate_limit_queue_depth',
+    'Callers waiting on the client-side LLM rate limiter',
     ['provider', 'model']
 )
 
+llm_rate_limit_wait_seconds = Histogram(
+    'llm_rate_limit_wait_seconds',
+    'Time spent waiting for LLM rate limit capacity',
+    ['provider', 'model'],
+    buckets=(0.01, 0.1, 0.5, 1, 2, 5, 10, 30, 60)
+)
+
 # Vector Search Metrics
 vector_search_duration_seconds = Histogram(
     'vector_search_duration_seconds',
@@ -42,6 +104,19 @@ vector_search_duration_seconds = Histogram(
     ['collection_id']
 )
 
+# Chat Metrics
+chat_session_cache_requests_total = Counter(
+    'chat_session_cache_requests_total',
+    'Chat session reads by in-process hot cache result',
+    ['result']
+)
+
+chat_retrievals_total = Counter(
+    'chat_retrievals_total',
+    'Collection-bound chat turns by retrieval outcome (search, reuse, empty, failed)',
+    ['result']
+)
+
 def track_time(metric: Histogram, labels: dict = None):
     def decorator(func):
         @wraps(func)
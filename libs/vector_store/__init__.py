@@ -0,0 +1,11 @@
+from .base import VectorStore, CollectionNotFoundError
+from .scoring import exact_search
+from .factory import create_vector_store, vector_store
+
+__all__ = [
+    "VectorStore",
+    "CollectionNotFoundError",
+    "exact_search",
+    "create_vector_store",
+    "vector_store"
+]
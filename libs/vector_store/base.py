@@ -0,0 +1,106 @@
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from libs.utils.config import config
+from libs.utils.metrics import vector_search_duration_seconds
+from .scoring import exact_search
+
+class CollectionNotFoundError(Exception):
+    def __init__(self, collection_id: str):
+        super().__init__(f"Collection {collection_id} does not exist")
+        self.collection_id = collection_id
+
+class VectorStore(ABC):
+    # Storage modes accepted by create_collection(quantization=...)
+    quantization_modes = ("none",)
+
+    @abstractmethod
+    def create_collection(self, collection_id: str, quantization: str = "none") -> None:
+        """Create an empty collection index"""
+        pass
+
+    @abstractmethod
+    def delete_collection(self, collection_id: str) -> None:
+        """Drop a collection index and all of its vectors"""
+        pass
+
+    @abstractmethod
+    def add(
+        self,
+        collection_id: str,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict],
+        documents: List[str]
+    ) -> None:
+        """Append vectors, creating the collection if needed"""
+        pass
+
+    @abstractmethod
+    def count(self, collection_id: str) -> int:
+        """Number of vectors stored in a collection"""
+        pass
+
+    @abstractmethod
+    def query(
+        self,
+        collection_id: str,
+        query_embedding: List[float],
+        top_k: int,
+        doc_ids: Optional[List[str]] = None
+    ) -> List[dict]:
+        """
+        Nearest-neighbor search
+        Returns: [{"id", "text", "metadata", "distance"}, ...] nearest first
+        """
+        pass
+
+    @abstractmethod
+    def get(self, collection_id: str, doc_ids: Optional[List[str]] = None) -> dict:
+        """
+        Fetch stored vectors, optionally restricted to documents
+        Returns: {"ids", "embeddings", "documents", "metadatas"}
+        """
+        pass
+
+    def search(
+        self,
+        collection_id: str,
+        query_embedding: List[float],
+        top_k: int,
+        doc_ids: Optional[List[str]] = None,
+        candidate_count: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Search a collection, optionally restricted to a resolved doc_id set.
+        Records vector_search_duration_seconds for every call.
+        """
+        start = time.perf_counter()
+        try:
+            return self._search(collection_id, query_embedding, top_k, doc_ids, candidate_count)
+        finally:
+            vector_search_duration_seconds.labels(collection_id=collection_id).observe(
+                time.perf_counter() - start
+            )
+
+    def _search(self, collection_id, query_embedding, top_k, doc_ids, candidate_count) -> List[dict]:
+        """Small filtered sets are fetched and scored exactly instead of going through ANN"""
+        if doc_ids is not None and not doc_ids:
+            return []
+
+        if doc_ids is not None and candidate_count is not None \
+                and candidate_count <= config.EXACT_SEARCH_MAX_CHUNKS:
+            candidates = self.get(collection_id, doc_ids)
+            top, distances = exact_search(candidates['embeddings'], query_embedding, top_k)
+            return [
+                {
+                    "id": candidates['ids'][i],
+                    "text": candidates['documents'][i],
+                    "metadata": candidates['metadatas'][i] if candidates['metadatas'] else {},
+                    "distance": float(distance)
+                }
+                for i, distance in zip(top, distances)
+            ]
+
+        n_results = top_k if candidate_count is None else min(top_k, candidate_count)
+        return self.query(collection_id, query_embedding, n_results, doc_ids)
@@ -0,0 +1,83 @@
+import chromadb
+from typing import List, Optional
+from libs.utils.config import config
+from .base import VectorStore, CollectionNotFoundError
+
+def build_where(doc_ids: Optional[List[str]]) -> Optional[dict]:
+    """Translate a resolved doc_id set into a Chroma `where` clause"""
+    if doc_ids is None:
+        return None
+    if len(doc_ids) == 1:
+        return {"doc_id": doc_ids[0]}
+    return {"doc_id": {"$in": doc_ids}}
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, host: str = None, port: int = None):
+        self.host = host or config.CHROMA_HOST
+        self.port = port or config.CHROMA_PORT
+        self._client = None
+
+    @property
+    def client(self):
+        # Connect lazily so importing a service doesn't require a running Chroma
+        if self._client is None:
+            self._client = chromadb.HttpClient(host=self.host, port=self.port)
+        return self._client
+
+    @staticmethod
+    def _name(collection_id: str) -> str:
+        return f"collection_{collection_id}"
+
+    def _get_collection(self, collection_id: str):
+        try:
+            return self.client.get_collection(name=self._name(collection_id))
+        except Exception as e:
+            if "does not exist" in str(e).lower():
+                raise CollectionNotFoundError(collection_id) from e
+            raise
+
+    def create_collection(self, collection_id: str, quantization: str = "none") -> None:
+        if quantization != "none":
+            raise ValueError("Quantized collections require VECTOR_STORE_BACKEND=local")
+        self.client.create_collection(name=self._name(collection_id))
+
+    def delete_collection(self, collection_id: str) -> None:
+        self.client.delete_collection(name=self._name(collection_id))
+
+    def add(self, collection_id, ids, embeddings, metadatas, documents) -> None:
+        collection = self.client.get_or_create_collection(self._name(collection_id))
+        collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=documents
+        )
+
+    def count(self, collection_id: str) -> int:
+        return self._get_collection(collection_id).count()
+
+    def query(self, collection_id, query_embedding, top_k, doc_ids=None) -> List[dict]:
+        collection = self._get_collection(collection_id)
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k,
+            where=build_where(doc_ids)
+        )
+
+        hits = []
+        if results['documents'] and results['documents'][0]:
+            for i, doc in enumerate(results['documents'][0]):
+                hits.append({
+                    "id": results['ids'][0][i],
+                    "text": doc,
+                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
+                    "distance": results['distances'][0][i] if results['distances'] else 0
+                })
+        return hits
+
+    def get(self, collection_id, doc_ids=None) -> dict:
+        collection = self._get_collection(collection_id)
+        return collection.get(
+            where=build_where(doc_ids),
+            include=["embeddings", "documents", "metadatas"]
+        )
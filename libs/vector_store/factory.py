@@ -0,0 +1,18 @@
+from typing import Optional
+from libs.utils.config import config
+from .base import VectorStore
+
+def create_vector_store(backend: Optional[str] = None) -> VectorStore:
+    """Build the vector store selected by VECTOR_STORE_BACKEND"""
+    backend = (backend or config.VECTOR_STORE_BACKEND).lower()
+
+    if backend == "chroma":
+        from .chroma_store import ChromaVectorStore
+        return ChromaVectorStore()
+    elif backend == "local":
+        from .local_store import LocalVectorStore
+        return LocalVectorStore()
+    else:
+        raise ValueError(f"Unknown vector store backend: {backend}")
+
+vector_store = create_vector_store()
@@ -0,0 +1,471 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import List, Optional, Dict, NamedTuple
+from libs.utils.config import config
+from libs.utils.logging import setup_logger
+from .base import VectorStore, CollectionNotFoundError
+from .scoring import exact_search
+from .quantization import (
+    QUANTIZATION_MODES, ProductQuantizer, int8_encode, int8_distances,
+    choose_subvectors, scan_candidates, SCAN_BLOCK_ROWS
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev setups only
+    fcntl = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = setup_logger("local-vector-store")
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "records.jsonl"
+LOCK_FILE = ".lock"
+HNSW_FILE = "index.hnsw"
+NORMS_FILE = "norms.f32"
+INT8_CODES_FILE = "codes.i8"
+INT8_SCALES_FILE = "scales.f32"
+PQ_CODES_FILE = "codes.pq"
+PQ_CODEBOOK_FILE = "pq_codebook.npy"
+
+class _CollectionState:
+    """In-process view of an on-disk collection, refreshed as writers append"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.meta_inode = None
+        self.generation = None
+        self.dim: Optional[int] = None
+        self.quantization = "none"
+        self.pq: Optional[ProductQuantizer] = None
+        self.vectors: Optional[np.memmap] = None
+        self.norms = np.empty(0, dtype=np.float32)
+        self.codes: Optional[np.memmap] = None
+        self.scales: Optional[np.memmap] = None
+        self.ids: List[str] = []
+        self.doc_rows: Dict[str, List[int]] = {}
+        self.metadatas: List[dict] = []
+        self.documents: List[str] = []
+        self.records_pos = 0
+        self.hnsw = None
+        self.hnsw_count = 0
+        self.hnsw_inode = None
+
+class _Snapshot(NamedTuple):
+    """Consistent rows [0, size) of a collection; record lists only ever grow"""
+    state: _CollectionState
+    vectors: Optional[np.ndarray]
+    norms: np.ndarray
+    codes: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+
+    @property
+    def size(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index persisted under VECTOR_STORE_PATH.
+
+    Each collection is an append-only float32 matrix (memory-mapped, so the OS
+    page cache is shared between processes) plus a JSONL record file. Small
+    collections are scored by NumPy brute force; once a collection reaches
+    LOCAL_HNSW_MIN_VECTORS and hnswlib is installed, writers extend an HNSW
+    graph persisted next to the vectors; readers only load it.
+
+    Collections created with quantization="int8" or "pq" also keep compact
+    codes. Searches scan the codes and re-score only the best candidates
+    against the float32 rows, so the full-precision matrix stays on disk.
+    """
+
+    quantization_modes = QUANTIZATION_MODES
+
+    def __init__(self, root: str = None):
+        self.root = root or config.VECTOR_STORE_PATH
+        self._states: Dict[str, _CollectionState] = {}
+        self._states_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, collection_id: str) -> str:
+        return os.path.join(self.root, f"collection_{collection_id}")
+
+    @contextmanager
+    def _write_lock(self, path: str):
+        with open(os.path.join(path, LOCK_FILE), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self, path: str) -> dict:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f)
+
+    def _write_meta(self, path: str, meta: dict) -> None:
+        tmp_path = os.path.join(path, META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, META_FILE))
+
+    def create_collection(self, collection_id: str, quantization: str = "none") -> None:
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        path = self._path(collection_id)
+        if os.path.exists(os.path.join(path, META_FILE)):
+            raise ValueError(f"Collection {collection_id} already exists")
+        os.makedirs(path, exist_ok=True)
+        self._write_meta(path, {
+            "dim": None,
+            "generation": str(uuid.uuid4()),
+            "quantization": quantization
+        })
+
+    def delete_collection(self, collection_id: str) -> None:
+        with self._states_lock:
+            self._states.pop(collection_id, None)
+        path = self._path(collection_id)
+        if not os.path.exists(path):
+            raise CollectionNotFoundError(collection_id)
+        shutil.rmtree(path)
+
+    def add(self, collection_id, ids, embeddings, metadatas, documents) -> None:
+        if not ids:
+            return
+
+        path = self._path(collection_id)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            os.makedirs(path, exist_ok=True)
+            with self._write_lock(path):
+                if not os.path.exists(os.path.join(path, META_FILE)):
+                    self._write_meta(path, {"dim": None, "generation": str(uuid.uuid4())})
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(ids):
+            raise ValueError("Expected one embedding per id")
+
+        with self._write_lock(path):
+            meta = self._read_meta(path)
+            if meta.get("dim") is None:
+                meta["dim"] = int(matrix.shape[1])
+                self._write_meta(path, meta)
+            elif meta["dim"] != matrix.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {matrix.shape[1]} does not match collection dimensionality {meta['dim']}"
+                )
+
+            vectors_path = os.path.join(path, VECTORS_FILE)
+            existing = os.path.getsize(vectors_path) // (4 * meta["dim"]) if os.path.exists(vectors_path) else 0
+
+            # Vectors, norms and codes are written before records so readers
+            # never see a record without its row
+            self._backfill_norms(path, meta["dim"])
+            self._append(path, VECTORS_FILE, matrix)
+            self._append(path, NORMS_FILE, np.einsum('ij,ij->i', matrix, matrix))
+
+            quantization = meta.get("quantization", "none")
+            if quantization == "int8":
+                codes, scales = int8_encode(matrix)
+                self._append(path, INT8_CODES_FILE, codes)
+                self._append(path, INT8_SCALES_FILE, scales)
+            elif quantization == "pq":
+                self._append_pq_codes(path, meta, matrix, existing)
+
+            with open(os.path.join(path, RECORDS_FILE), "a", encoding="utf-8") as f:
+                for chunk_id, metadata, document in zip(ids, metadatas, documents):
+                    f.write(json.dumps({"id": chunk_id, "metadata": metadata, "document": document}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            total = existing + len(matrix)
+            if hnswlib is not None and quantization == "none" and total >= config.LOCAL_HNSW_MIN_VECTORS:
+                self._extend_hnsw(path, meta["dim"], total)
+
+    def _append(self, path: str, filename: str, array: np.ndarray) -> None:
+        with open(os.path.join(path, filename), "ab") as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _backfill_norms(self, path: str, dim: int) -> None:
+        """Write norms for rows that have none (collections from before norms were stored); caller holds the write lock"""
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        norms_path = os.path.join(path, NORMS_FILE)
+        rows = os.path.getsize(vectors_path) // (4 * dim) if os.path.exists(vectors_path) else 0
+        have = os.path.getsize(norms_path) // 4 if os.path.exists(norms_path) else 0
+        if have >= rows:
+            return
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+        for lo in range(have, rows, SCAN_BLOCK_ROWS):
+            block = vectors[lo:min(lo + SCAN_BLOCK_ROWS, rows)]
+            self._append(path, NORMS_FILE, np.einsum('ij,ij->i', block, block))
+        logger.info(f"Backfilled norms for {rows - have} vectors in {path}")
+
+    def _extend_hnsw(self, path: str, dim: int, total: int) -> None:
+        """Add rows [indexed, total) to the persisted HNSW graph; caller holds the write lock"""
+        index_path = os.path.join(path, HNSW_FILE)
+        index = hnswlib.Index(space="l2", dim=dim)
+        count = 0
+        if os.path.exists(index_path):
+            index.load_index(index_path, max_elements=total)
+            count = index.get_current_count()
+        if count == 0 or count > total:
+            index = hnswlib.Index(space="l2", dim=dim)
+            index.init_index(max_elements=total, ef_construction=200, M=16)
+            count = 0
+        if count == total:
+            return
+        if index.get_max_elements() < total:
+            index.resize_index(total)
+
+        vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode="r", shape=(total, dim))
+        for lo in range(count, total, SCAN_BLOCK_ROWS):
+            hi = min(lo + SCAN_BLOCK_ROWS, total)
+            index.add_items(np.asarray(vectors[lo:hi]), np.arange(lo, hi))
+        tmp_path = index_path + f".{os.getpid()}.tmp"
+        index.save_index(tmp_path)
+        os.replace(tmp_path, index_path)
+        logger.info(f"HNSW index for {path} extended to {total} vectors")
+
+    def _append_pq_codes(self, path: str, meta: dict, matrix: np.ndarray, existing: int) -> None:
+        """Encode new rows, training the codebook once enough vectors exist"""
+        if meta.get("pq_trained"):
+            pq = ProductQuantizer.load(os.path.join(path, PQ_CODEBOOK_FILE))
+            self._append(path, PQ_CODES_FILE, pq.encode(matrix))
+            return
+
+        total = existing + len(matrix)
+        if total < config.PQ_TRAIN_SIZE:
+            # Too few vectors to train on; searched with float brute force until then
+            return
+
+        vectors = np.memmap(
+            os.path.join(path, VECTORS_FILE), dtype=np.float32, mode="r", shape=(total, meta["dim"])
+        )
+        m = choose_subvectors(meta["dim"], config.PQ_SUBVECTORS)
+        pq = ProductQuantizer.train(vectors, m)
+        pq.save(os.path.join(path, PQ_CODEBOOK_FILE))
+
+        codes_path = os.path.join(path, PQ_CODES_FILE)
+        if os.path.exists(codes_path):
+            os.unlink(codes_path)
+        for lo in range(0, total, SCAN_BLOCK_ROWS):
+            self._append(path, PQ_CODES_FILE, pq.encode(vectors[lo:lo + SCAN_BLOCK_ROWS]))
+
+        meta["pq_trained"] = True
+        self._write_meta(path, meta)
+        logger.info(f"Trained PQ codebook ({m} subvectors) on {total} vectors in {path}")
+
+    def _snapshot(self, collection_id: str) -> _Snapshot:
+        path = self._path(collection_id)
+        with self._states_lock:
+            state = self._states.get(collection_id)
+            if state is None:
+                state = _CollectionState(path)
+                self._states[collection_id] = state
+
+        with state.lock:
+            self._refresh(collection_id, state)
+            return _Snapshot(state, state.vectors, state.norms, state.codes, state.scales)
+
+    def _refresh(self, collection_id: str, state: _CollectionState) -> None:
+        """Pick up rows appended by other processes since the last refresh"""
+        try:
+            inode = os.stat(os.path.join(state.path, META_FILE)).st_ino
+        except FileNotFoundError:
+            raise CollectionNotFoundError(collection_id)
+
+        remap = False
+        if inode != state.meta_inode:
+            meta = self._read_meta(state.path)
+            if state.generation is not None and meta.get("generation") != state.generation:
+                # Dropped and recreated by another process
+                state.reset()
+            state.meta_inode = inode
+            state.generation = meta.get("generation")
+            state.dim = meta.get("dim")
+            state.quantization = meta.get("quantization", "none")
+            if meta.get("pq_trained") and state.pq is None:
+                state.pq = ProductQuantizer.load(os.path.join(state.path, PQ_CODEBOOK_FILE))
+                remap = True  # codes now exist for rows already mapped
+
+        if state.dim is None:
+            return
+
+        records_path = os.path.join(state.path, RECORDS_FILE)
+        if os.path.exists(records_path) and os.path.getsize(records_path) > state.records_pos:
+            with open(records_path, "rb") as f:
+                f.seek(state.records_pos)
+                data = f.read()
+
+            # Only consume complete lines; a writer may be mid-append
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                record = json.loads(line)
+                metadata = record.get("metadata") or {}
+                state.doc_rows.setdefault(metadata.get("doc_id"), []).append(len(state.ids))
+                state.ids.append(record["id"])
+                state.metadatas.append(metadata)
+                state.documents.append(record.get("document"))
+            state.records_pos += end
+            remap = remap or end > 0
+
+        if remap and state.ids:
+            self._map_rows(state)
+
+    def _map_rows(self, state: _CollectionState) -> None:
+        """Memory-map the first len(state.ids) rows of every per-row file"""
+        n = len(state.ids)
+
+        def mapped(filename, dtype, shape):
+            return np.memmap(os.path.join(state.path, filename), dtype=dtype, mode="r", shape=shape)
+
+        vectors = mapped(VECTORS_FILE, np.float32, (n, state.dim))
+        norms_path = os.path.join(state.path, NORMS_FILE)
+        if not os.path.exists(norms_path) or os.path.getsize(norms_path) < 4 * n:
+            with self._write_lock(state.path):
+                self._backfill_norms(state.path, state.dim)
+        state.norms = mapped(NORMS_FILE, np.float32, (n,))
+
+        if state.quantization == "int8":
+            state.codes = mapped(INT8_CODES_FILE, np.int8, (n, state.dim))
+            state.scales = mapped(INT8_SCALES_FILE, np.float32, (n,))
+        elif state.quantization == "pq" and state.pq is not None:
+            state.codes = mapped(PQ_CODES_FILE, np.uint8, (n, state.pq.m))
+        state.vectors = vectors
+
+    def count(self, collection_id: str) -> int:
+        return self._snapshot(collection_id).size
+
+    def _rows_for_docs(self, snap: _Snapshot, doc_ids: List[str]) -> np.ndarray:
+        doc_rows = snap.state.doc_rows
+        rows = [np.asarray(doc_rows[doc_id], dtype=np.int64) for doc_id in set(doc_ids) if doc_id in doc_rows]
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        rows = np.sort(np.concatenate(rows))
+        # Rows appended after the snapshot was taken aren't mapped in it
+        return rows[:np.searchsorted(rows, snap.size)]
+
+    def _hit(self, state: _CollectionState, row: int, distance: float) -> dict:
+        return {
+            "id": state.ids[row],
+            "text": state.documents[row],
+            "metadata": state.metadatas[row],
+            "distance": float(distance)
+        }
+
+    def query(self, collection_id, query_embedding, top_k, doc_ids=None) -> List[dict]:
+        snap = self._snapshot(collection_id)
+        state = snap.state
+        if snap.size == 0:
+            return []
+
+        if doc_ids is not None:
+            rows = self._rows_for_docs(snap, doc_ids)
+            top, distances = exact_search(snap.vectors[rows], query_embedding, top_k, snap.norms[rows])
+            return [self._hit(state, rows[i], d) for i, d in zip(top, distances)]
+
+        if snap.codes is not None:
+            return self._quantized_query(snap, query_embedding, top_k)
+
+        if hnswlib is not None and snap.size >= config.LOCAL_HNSW_MIN_VECTORS:
+            with state.lock:
+                labels, distances = self._hnsw_query(snap, query_embedding, top_k)
+            return [self._hit(state, row, d) for row, d in zip(labels, distances)]
+
+        top, distances = exact_search(snap.vectors, query_embedding, top_k, snap.norms)
+        return [self._hit(state, row, d) for row, d in zip(top, distances)]
+
+    def _quantized_query(self, snap: _Snapshot, query_embedding, top_k: int) -> List[dict]:
+        """Scan compact codes for candidates, then re-score them with float32 rows"""
+        state = snap.state
+        query = np.asarray(query_embedding, dtype=np.float32)
+
+        if state.quantization == "pq":
+            table = state.pq.distance_table(query)
+            approx = lambda lo, hi: state.pq.distances(snap.codes[lo:hi], table)
+        else:
+            approx = lambda lo, hi: int8_distances(
+                snap.codes[lo:hi], snap.scales[lo:hi], snap.norms[lo:hi], query
+            )
+
+        n_candidates = min(snap.size, top_k * config.QUANTIZATION_RESCORE_FACTOR)
+        candidates = scan_candidates(approx, snap.size, n_candidates)
+        top, distances = exact_search(snap.vectors[candidates], query, top_k, snap.norms[candidates])
+        return [self._hit(state, candidates[i], d) for i, d in zip(top, distances)]
+
+    def _hnsw_query(self, snap: _Snapshot, query_embedding, top_k: int):
+        """
+        Search the persisted HNSW graph; rows appended since the writer last
+        extended it (or all rows, if it doesn't exist yet) are scored exactly
+        """
+        state, size = snap.state, snap.size
+        index_path = os.path.join(state.path, HNSW_FILE)
+        try:
+            inode = os.stat(index_path).st_ino
+        except FileNotFoundError:
+            inode = None
+
+        if inode != state.hnsw_inode:
+            state.hnsw, state.hnsw_count = None, 0
+            if inode is not None:
+                state.hnsw = hnswlib.Index(space="l2", dim=state.dim)
+                state.hnsw.load_index(index_path)
+                state.hnsw_count = state.hnsw.get_current_count()
+            state.hnsw_inode = inode
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        indexed = min(state.hnsw_count, size)
+        labels = np.empty(0, dtype=np.int64)
+        distances = np.empty(0, dtype=np.float32)
+        if indexed:
+            # The graph may be ahead of this snapshot; ask for enough to drop those rows
+            k = min(top_k + state.hnsw_count - indexed, state.hnsw_count)
+            state.hnsw.set_ef(max(k * 2, 64))
+            found, found_distances = state.hnsw.knn_query(query, k=k)
+            keep = found[0] < size
+            labels = found[0][keep].astype(np.int64)
+            distances = found_distances[0][keep]
+        if indexed < size:
+            top, tail_distances = exact_search(snap.vectors[indexed:size], query, top_k, snap.norms[indexed:size])
+            labels = np.concatenate([labels, top + indexed])
+            distances = np.concatenate([distances, tail_distances])
+
+        order = np.argsort(distances)[:top_k]
+        return labels[order], distances[order]
+
+    def get(self, collection_id, doc_ids=None) -> dict:
+        snap = self._snapshot(collection_id)
+        state = snap.state
+        if snap.size == 0:
+            return {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+
+        rows = np.arange(snap.size) if doc_ids is None else self._rows_for_docs(snap, doc_ids)
+        return {
+            "ids": [state.ids[i] for i in rows],
+            "embeddings": np.asarray(snap.vectors[rows]),
+            "documents": [state.documents[i] for i in rows],
+            "metadatas": [state.metadatas[i] for i in rows]
+        }
+
+    def _search(self, collection_id, query_embedding, top_k, doc_ids, candidate_count) -> List[dict]:
+        # Filtered rows are already local, so they're always scored exactly
+        if doc_ids is not None and not doc_ids:
+            return []
+        return self.query(collection_id, query_embedding, top_k, doc_ids)
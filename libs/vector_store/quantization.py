@@ -0,0 +1,130 @@
+import numpy as np
+from typing import Tuple
+
+QUANTIZATION_MODES = ("none", "int8", "pq")
+
+# Rows scored per block when scanning codes, so decoding never materialises
+# a full float32 copy of a large collection
+SCAN_BLOCK_ROWS = 2048
+
+def int8_encode(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector scalar quantization
+    Returns: (int8 codes, float32 scale per row) with x ~= codes * scale
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def int8_distances(codes: np.ndarray, scales: np.ndarray, norms: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate squared L2 distances against int8 codes using exact row norms"""
+    dots = (codes.astype(np.float32) @ query) * scales
+    return norms - 2 * dots + float(query @ query)
+
+def choose_subvectors(dim: int, requested: int) -> int:
+    """Largest subvector count <= requested that evenly divides dim"""
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+class ProductQuantizer:
+    """Product quantization with 256 centroids per subspace (one uint8 per subvector)"""
+
+    def __init__(self, codebooks: np.ndarray):
+        # codebooks: (m, k, dsub)
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.m, self.k, self.dsub = self.codebooks.shape
+
+    @classmethod
+    def train(
+        cls,
+        matrix: np.ndarray,
+        m: int,
+        k: int = 256,
+        iterations: int = 15,
+        sample_size: int = 256 * 40,
+        seed: int = 0
+    ) -> "ProductQuantizer":
+        rng = np.random.default_rng(seed)
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if len(matrix) > sample_size:
+            matrix = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+
+        k = min(k, len(matrix))
+        dsub = matrix.shape[1] // m
+        codebooks = np.empty((m, k, dsub), dtype=np.float32)
+
+        for i in range(m):
+            sub = matrix[:, i * dsub:(i + 1) * dsub]
+            centroids = sub[rng.choice(len(sub), k, replace=False)].copy()
+            for _ in range(iterations):
+                assignments = cls._assign(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignments, sub)
+                counts = np.bincount(assignments, minlength=k)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+                # Re-seed empty clusters from random points
+                if not filled.all():
+                    centroids[~filled] = sub[rng.choice(len(sub), int((~filled).sum()))]
+            codebooks[i] = centroids
+
+        return cls(codebooks)
+
+    @staticmethod
+    def _assign(sub: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (
+            np.einsum('ij,ij->i', centroids, centroids)[None, :]
+            - 2 * (sub @ centroids.T)
+        )
+        return distances.argmin(axis=1)
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        codes = np.empty((len(matrix), self.m), dtype=np.uint8)
+        for i in range(self.m):
+            sub = matrix[:, i * self.dsub:(i + 1) * self.dsub]
+            codes[:, i] = self._assign(sub, self.codebooks[i])
+        return codes
+
+    def distance_table(self, query: np.ndarray) -> np.ndarray:
+        """Squared L2 from each query subvector to every centroid: (m, k)"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.m, 1, self.dsub)
+        return ((self.codebooks - query) ** 2).sum(axis=2)
+
+    def distances(self, codes: np.ndarray, table: np.ndarray) -> np.ndarray:
+        """Asymmetric distance computation: sum of per-subspace table lookups"""
+        return table[np.arange(self.m), codes.astype(np.intp)].sum(axis=1)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.save(f, self.codebooks)
+
+    @classmethod
+    def load(cls, path: str) -> "ProductQuantizer":
+        return cls(np.load(path))
+
+def scan_candidates(approx_distances, size: int, n_candidates: int) -> np.ndarray:
+    """
+    Blocked scan over approximate distances, keeping the best n_candidates rows
+    approx_distances(lo, hi) scores rows [lo, hi)
+    Returns: candidate row indices in ascending order (sequential re-score reads)
+    """
+    rows, distances = [], []
+    for lo in range(0, size, SCAN_BLOCK_ROWS):
+        hi = min(size, lo + SCAN_BLOCK_ROWS)
+        block = approx_distances(lo, hi)
+        c = min(n_candidates, len(block))
+        best = np.argpartition(block, c - 1)[:c]
+        rows.append(best + lo)
+        distances.append(block[best])
+
+    rows = np.concatenate(rows)
+    distances = np.concatenate(distances)
+    if len(rows) > n_candidates:
+        keep = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+        rows = rows[keep]
+    return np.sort(rows)
@@ -0,0 +1,20 @@
+import numpy as np
+from typing import Optional
+
+def exact_search(embeddings, query_embedding, top_k: int, norms: Optional[np.ndarray] = None) -> tuple:
+    """
+    Brute-force squared L2 scoring (Chroma's default space) in NumPy
+    Returns: (indices, distances) of the top_k nearest rows
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    if matrix.size == 0 or top_k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    if norms is None:
+        norms = np.einsum('ij,ij->i', matrix, matrix)
+    distances = norms - 2 * (matrix @ query) + float(query @ query)
+    k = min(top_k, len(distances))
+    top = np.argpartition(distances, k - 1)[:k]
+    top = top[np.argsort(distances[top])]
+    return top, distances[top]
@@ -1,10 +1,18 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Query
 from pydantic import BaseModel
+from typing import List, Optional
 from prometheus_client import make_asgi_app
-import chromadb
+import aiosqlite
 from libs.utils.logging import setup_logger
 from libs.utils.config import config
 from libs.model_router import model_router
+from libs.vector_store import vector_store
+from libs.retrieval import (
+    SearchFilters, resolve_filters, embed_query,
+    expand_neighbors as expand_context,
+    RAG_SYSTEM_PROMPT, build_rag_prompt
+)
 
 logger = setup_logger("agent-router")
 app = FastAPI(title="Agent Router Service")
@@ -12,8 +20,6 @@ app = FastAPI(title="Agent Router Service")
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
-chroma_client = chromadb.HttpClient(host=config.CHROMA_HOST, port=config.CHROMA_PORT)
-
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
@@ -24,37 +30,63 @@ class SearchResponse(BaseModel):
     answer: str = None
 
 @app.get("/collections/{collection_id}/search", response_model=SearchResponse)
-async def search_collection(collection_id: str, query: str, top_k: int = 5):
+async def search_collection(
+    collection_id: str,
+    query: str,
+    top_k: int = 5,
+    expand_neighbors: bool = False,
+    neighbor_window: int = Query(1, ge=0, le=config.MAX_NEIGHBOR_WINDOW),
+    doc_ids: Optional[List[str]] = Query(None),
+    filename: Optional[str] = None,
+    uploaded_after: Optional[str] = None,
+    uploaded_before: Optional[str] = None
+):
     try:
-        # Retrieve from vector store
-        collection = chroma_client.get_collection(f"collection_{collection_id}")
-        results = collection.query(
-            query_texts=[query],
-            n_results=top_k
+        filters = SearchFilters(
+            doc_ids=doc_ids,
+            filename=filename,
+            uploaded_after=uploaded_after,
+            uploaded_before=uploaded_before
         )
         
-        chunks = []
-        if results['documents'] and results['documents'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                chunks.append({
-                    "text": doc,
-                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                    "distance": results['distances'][0][i] if results['distances'] else 0
-                })
+        # Resolve document filters in SQLite to a doc_id set for pushdown
+        filter_doc_ids, candidate_count = None, None
+        if not filters.is_empty():
+            async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
+                filter_doc_ids, candidate_count = await resolve_filters(conn, collection_id, filters)
+        
+        # Retrieve from vector store; the search is blocking, so keep it off the event loop
+        query_embedding = await embed_query(query)
+        hits = await asyncio.to_thread(
+            vector_store.search,
+            collection_id,
+            query_embedding,
+            top_k,
+            doc_ids=filter_doc_ids,
+            candidate_count=candidate_count
+        )
+        
+        chunks = [
+            {
+                "text": hit["text"],
+                "metadata": hit["metadata"],
+                "distance": hit["distance"]
+            }
+            for hit in hits
+        ]
+        
+        # Optionally widen each hit with its adjacent chunks from SQLite
+        if expand_neighbors and chunks:
+            async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
+                chunks = await expand_context(conn, chunks, neighbor_window)
         
         # Build prompt with context
-        context = "\n\n".join([chunk["text"] for chunk in chunks])
-        prompt = f"""Based on the following context, answer the question.
-
-Context:
-{context}
-
-Question: {query}
-
-Answer:"""
+        context = "\n\n".join([chunk.get("context", chunk["text"]) for chunk in chunks])
         
         # Generate answer using model router
-        answer = await model_router.complete(prompt, task_type="rag")
+        answer = await model_router.complete(
+            build_rag_prompt(context, query), task_type="rag", system_prompt=RAG_SYSTEM_PROMPT
+        )
         
         logger.info(f"RAG search completed for collection {collection_id}")
         return SearchResponse(chunks=chunks, answer=answer)
@@ -1,21 +1,101 @@
+import asyncio
 import aiosqlite
-from typing import Optional
+import base64
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable, List, Optional
 from libs.utils.config import config
+from .migrations import migrate
+
+def timestamp() -> str:
+    """Current UTC time in the format of SQLite's CURRENT_TIMESTAMP defaults"""
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+def encode_cursor(*values) -> str:
+    """Opaque pagination cursor holding the sort key of the last row returned"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Returns: the values passed to encode_cursor
+    Raises: ValueError if the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
 
 class Database:
-    def __init__(self):
+    """
+    SQLite in WAL mode: `conn` is the single writer (and is used for anything that
+    writes), while reads go through a pool of read-only connections via
+    fetchone/fetchall/reader. WAL lets those readers run concurrently with each
+    other and with the writer, each on its own aiosqlite thread, and see every
+    committed write.
+    """
+    
+    def __init__(self, read_pool_size: Optional[int] = None):
         self.db_path = config.SQLITE_DB_PATH
+        self.read_pool_size = read_pool_size or config.SQLITE_READ_POOL_SIZE
         self.conn: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
     
     async def connect(self):
         self.conn = await aiosqlite.connect(self.db_path)
         self.conn.row_factory = aiosqlite.Row
+        # journal_mode is persistent, so services opening their own connections get WAL too
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+        await self.conn.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
         await self.init_schema()
+        await migrate(self.conn)
+        
+        self._idle_readers = asyncio.Queue()
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        for _ in range(self.read_pool_size):
+            reader = await aiosqlite.connect(uri, uri=True)
+            reader.row_factory = aiosqlite.Row
+            await reader.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+            self._readers.append(reader)
+            self._idle_readers.put_nowait(reader)
     
     async def disconnect(self):
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
         if self.conn:
             await self.conn.close()
     
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Check out a read-only connection, waiting if all are busy"""
+        reader = await self._idle_readers.get()
+        try:
+            yield reader
+        finally:
+            # End the read transaction so the next user sees the latest commits
+            if reader.in_transaction:
+                await reader.rollback()
+            self._idle_readers.put_nowait(reader)
+    
+    async def fetchone(self, query: str, params: Iterable[Any] = ()) -> Optional[aiosqlite.Row]:
+        """Run a SELECT on a reader; returns the first row"""
+        async with self.reader() as reader:
+            cursor = await reader.execute(query, params)
+            return await cursor.fetchone()
+    
+    async def fetchall(self, query: str, params: Iterable[Any] = ()) -> List[aiosqlite.Row]:
+        """Run a SELECT on a reader; returns every row"""
+        async with self.reader() as reader:
+            cursor = await reader.execute(query, params)
+            return await cursor.fetchall()
+    
     async def init_schema(self):
         await self.conn.executescript("""
             CREATE TABLE IF NOT EXISTS users (
@@ -58,12 +138,15 @@ class Database:
                 FOREIGN KEY (doc_id) REFERENCES documents(id) ON DELETE CASCADE
             );
             
+            CREATE INDEX IF NOT EXISTS idx_chunks_doc_offset ON chunks(doc_id, offset);
+            
             CREATE TABLE IF NOT EXISTS chat_sessions (
                 id TEXT PRIMARY KEY,
                 user_id TEXT NOT NULL,
                 model TEXT,
                 collection_id TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                message_count INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (user_id) REFERENCES users(id),
                 FOREIGN KEY (collection_id) REFERENCES collections(id)
             );
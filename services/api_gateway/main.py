@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
@@ -10,10 +10,11 @@ from typing import Optional, List, Dict, Any
 from pathlib import Path
 import json
 import asyncio
-import httpx
 
-from .database import db
+from .database import db, timestamp, encode_cursor, decode_cursor
+from .upstream import pool, chat_service, stock_producer, UpstreamUnavailable
 from .auth import hash_password, verify_password, create_access_token, get_current_user
+from libs.utils.config import config
 from libs.utils.logging import setup_logger
 from libs.utils.metrics import http_requests_total, http_request_duration_seconds
 import time
@@ -44,6 +45,7 @@ async def startup():
 
 @app.on_event("shutdown")
 async def shutdown():
+    await pool.close()
     await db.disconnect()
     logger.info("API Gateway stopped")
 
@@ -103,11 +105,10 @@ async def register(req: RegisterRequest):
 
 @app.post("/auth/login", response_model=TokenResponse)
 async def login(req: LoginRequest):
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT id, hashed_password FROM users WHERE email = ?",
         (req.email,)
     )
-    row = await cursor.fetchone()
     
     if not row or not verify_password(req.password, row[1]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -202,6 +203,7 @@ async def github_docs_page():
 class CreateCollectionRequest(BaseModel):
     name: str
     domain: Optional[str] = None
+    quantization: str = "none"  # "none", "int8" or "pq" (local vector store only)
 
 class CollectionResponse(BaseModel):
     id: str
@@ -213,28 +215,34 @@ class CollectionResponse(BaseModel):
 # Collection API Endpoints
 @app.post("/api/collections", response_model=CollectionResponse)
 async def create_collection(req: CreateCollectionRequest, user_id: str = Depends(get_current_user)):
-    import chromadb
-    from libs.utils.config import config
+    from libs.vector_store import vector_store
+    
+    if req.quantization not in vector_store.quantization_modes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported quantization '{req.quantization}' for this vector store"
+        )
     
     collection_id = str(uuid.uuid4())
     
     try:
-        await db.conn.execute(
-            "INSERT INTO collections (id, name, owner_id, domain) VALUES (?, ?, ?, ?)",
-            (collection_id, req.name, user_id, req.domain)
-        )
-        await db.conn.commit()
-        
-        # Initialize ChromaDB collection
-        chroma_client = chromadb.HttpClient(host=config.CHROMA_HOST, port=config.CHROMA_PORT)
-        chroma_client.create_collection(name=f"collection_{collection_id}")
+        # Initialize vector index for the collection first, so a failure leaves no row behind
+        await asyncio.to_thread(vector_store.create_collection, collection_id, quantization=req.quantization)
+        try:
+            await db.conn.execute(
+                "INSERT INTO collections (id, name, owner_id, domain) VALUES (?, ?, ?, ?)",
+                (collection_id, req.name, user_id, req.domain)
+            )
+            await db.conn.commit()
+        except Exception:
+            await asyncio.to_thread(vector_store.delete_collection, collection_id)
+            raise
         
         logger.info(f"Collection created: {collection_id}")
         
-        cursor = await db.conn.execute(
+        row = await db.fetchone(
             "SELECT * FROM collections WHERE id = ?", (collection_id,)
         )
-        row = await cursor.fetchone()
         
         return CollectionResponse(
             id=row[0],
@@ -249,10 +257,9 @@ async def create_collection(req: CreateCollectionRequest, user_id: str = Depends
 
 @app.get("/api/collections")
 async def list_collections(user_id: str = Depends(get_current_user)):
-    cursor = await db.conn.execute(
+    rows = await db.fetchall(
         "SELECT * FROM collections WHERE owner_id = ?", (user_id,)
     )
-    rows = await cursor.fetchall()
     
     return [
         CollectionResponse(
@@ -267,14 +274,12 @@ async def list_collections(user_id: str = Depends(get_current_user)):
 
 @app.delete("/api/collections/{collection_id}")
 async def delete_collection(collection_id: str, user_id: str = Depends(get_current_user)):
-    import chromadb
-    from libs.utils.config import config
+    from libs.vector_store import vector_store
     
     # Verify ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT owner_id FROM collections WHERE id = ?", (collection_id,)
     )
-    row = await cursor.fetchone()
     
     if not row:
         raise HTTPException(status_code=404, detail="Collection not found")
@@ -286,10 +291,9 @@ async def delete_collection(collection_id: str, user_id: str = Depends(get_curre
     await db.conn.execute("DELETE FROM collections WHERE id = ?", (collection_id,))
     await db.conn.commit()
     
-    # Delete ChromaDB collection
+    # Delete vector index
     try:
-        chroma_client = chromadb.HttpClient(host=config.CHROMA_HOST, port=config.CHROMA_PORT)
-        chroma_client.delete_collection(name=f"collection_{collection_id}")
+        await asyncio.to_thread(vector_store.delete_collection, collection_id)
     except:
         pass
     
@@ -317,10 +321,9 @@ async def upload_document(collection_id: str, req: UploadRequest, user_id: str =
     from .minio_client import minio_client
     
     # Verify collection ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT owner_id FROM collections WHERE id = ?", (collection_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -349,10 +352,9 @@ async def ingest_document(collection_id: str, req: IngestRequest, user_id: str =
     from services.celery_worker.celery_app import ingest_document_task
     
     # Verify ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT owner_id FROM collections WHERE id = ?", (collection_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -381,20 +383,18 @@ async def ingest_document(collection_id: str, req: IngestRequest, user_id: str =
 async def list_documents(collection_id: str, user_id: str = Depends(get_current_user)):
     """List all documents in a collection"""
     # Verify ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT owner_id FROM collections WHERE id = ?", (collection_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get documents
-    cursor = await db.conn.execute(
+    rows = await db.fetchall(
         "SELECT id, filename, status, created_at FROM documents WHERE collection_id = ? ORDER BY created_at DESC",
         (collection_id,)
     )
-    rows = await cursor.fetchall()
     
     documents = [
         {
@@ -411,7 +411,7 @@ async def list_documents(collection_id: str, user_id: str = Depends(get_current_
 @app.get("/api/documents/{document_id}/status")
 async def get_document_status(document_id: str, user_id: str = Depends(get_current_user)):
     """Get document processing status"""
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         """
         SELECT d.id, d.filename, d.status, d.created_at, c.owner_id
         FROM documents d
@@ -420,7 +420,6 @@ async def get_document_status(document_id: str, user_id: str = Depends(get_curre
         """,
         (document_id,)
     )
-    row = await cursor.fetchone()
     
     if not row:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -429,11 +428,10 @@ async def get_document_status(document_id: str, user_id: str = Depends(get_curre
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get chunk count
-    cursor = await db.conn.execute(
+    chunk_count = (await db.fetchone(
         "SELECT COUNT(*) FROM chunks WHERE doc_id = ?",
         (document_id,)
-    )
-    chunk_count = (await cursor.fetchone())[0]
+    ))[0]
     
     return {
         "id": row[0],
@@ -454,6 +452,11 @@ class ChatSessionResponse(BaseModel):
     model: Optional[str]
     collection_id: Optional[str]
     created_at: str
+    message_count: int = 0
+
+class ChatSessionPage(BaseModel):
+    sessions: List[ChatSessionResponse]
+    next_cursor: Optional[str]
 
 class SendMessageRequest(BaseModel):
     content: str
@@ -465,6 +468,11 @@ class MessageResponse(BaseModel):
     content: str
     created_at: str
 
+class MessagePage(BaseModel):
+    # Oldest first; next_cursor fetches the page of older messages
+    messages: List[MessageResponse]
+    next_cursor: Optional[str]
+
 # Chat API Endpoints
 @app.post("/api/chat/sessions", response_model=ChatSessionResponse)
 async def create_chat_session(req: CreateChatSessionRequest, user_id: str = Depends(get_current_user)):
@@ -478,26 +486,11 @@ async def create_chat_session(req: CreateChatSessionRequest, user_id: str = Depe
     )
     await db.conn.commit()
     
-    # Initialize session in chat service with LangChain memory
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                "http://localhost:8090/sessions",
-                json={
-                    "session_id": session_id,
-                    "model": model,
-                    "system_prompt": "You are a helpful AI assistant. Provide clear, accurate, and friendly responses."
-                },
-                timeout=10.0
-            )
-    except Exception as e:
-        logger.error(f"Error initializing chat service session: {e}")
-        # Continue anyway, session will be created on first message
+    # Chat service loads the session from this database on its first message
     
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT * FROM chat_sessions WHERE id = ?", (session_id,)
     )
-    row = await cursor.fetchone()
     
     logger.info(f"Chat session created: {session_id} with model {model}")
     return ChatSessionResponse(
@@ -508,74 +501,241 @@ async def create_chat_session(req: CreateChatSessionRequest, user_id: str = Depe
         created_at=row[4]
     )
 
+@app.get("/api/chat/sessions", response_model=ChatSessionPage)
+async def list_chat_sessions(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_current_user)
+):
+    """The user's chat sessions, newest first, with their maintained message counts"""
+    query = "SELECT id, user_id, model, collection_id, created_at, message_count, rowid FROM chat_sessions WHERE user_id = ?"
+    params: list = [user_id]
+    if cursor:
+        try:
+            created_at, rowid = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query += " AND (created_at, rowid) < (?, ?)"
+        params += [created_at, rowid]
+    query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    params.append(limit + 1)
+    
+    rows = await db.fetchall(query, params)
+    
+    next_cursor = encode_cursor(rows[limit - 1][4], rows[limit - 1][6]) if len(rows) > limit else None
+    return ChatSessionPage(
+        sessions=[
+            ChatSessionResponse(
+                id=row[0],
+                user_id=row[1],
+                model=row[2],
+                collection_id=row[3],
+                created_at=row[4],
+                message_count=row[5]
+            )
+            for row in rows[:limit]
+        ],
+        next_cursor=next_cursor
+    )
+
+@app.get("/api/chat/sessions/{session_id}/messages", response_model=MessagePage)
+async def get_messages(
+    session_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    A page of the session's messages: the newest page without a cursor, then
+    older pages via next_cursor. Ordered by (created_at, rowid), which the
+    (session_id, created_at) index serves directly.
+    """
+    # Verify session ownership
+    row = await db.fetchone(
+        "SELECT user_id FROM chat_sessions WHERE id = ?", (session_id,)
+    )
+    
+    if not row or row[0] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    query = "SELECT id, session_id, role, content, created_at, rowid FROM chat_messages WHERE session_id = ?"
+    params: list = [session_id]
+    if cursor:
+        try:
+            created_at, rowid = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query += " AND (created_at, rowid) < (?, ?)"
+        params += [created_at, rowid]
+    query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    params.append(limit + 1)
+    
+    rows = await db.fetchall(query, params)
+    
+    next_cursor = encode_cursor(rows[limit - 1][4], rows[limit - 1][5]) if len(rows) > limit else None
+    return MessagePage(
+        messages=[
+            MessageResponse(
+                id=row[0],
+                session_id=row[1],
+                role=row[2],
+                content=row[3],
+                created_at=row[4]
+            )
+            for row in reversed(rows[:limit])
+        ],
+        next_cursor=next_cursor
+    )
+
 @app.post("/api/chat/sessions/{session_id}/messages", response_model=MessageResponse)
 async def send_message(session_id: str, req: SendMessageRequest, user_id: str = Depends(get_current_user)):
     # Verify session ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT user_id, model, collection_id FROM chat_sessions WHERE id = ?", (session_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     session_model = row[1] or "gpt-4"
     
-    # Store user message
-    msg_id = str(uuid.uuid4())
+    logger.info(f"Message sent in session {session_id}")
+    
+    # Call chat service to get AI response
+    try:
+        chat_response = await chat_service.request(
+            "POST",
+            "/chat",
+            json={
+                "session_id": session_id,
+                "message": req.content,
+                "model": session_model,
+                "collection_id": row[2]
+            }
+        )
+        
+        if chat_response.status_code == 200:
+            ai_response = chat_response.json()
+            
+            # Store the turn and return the AI response
+            ai_message = await store_turn(session_id, req.content, ai_response["message"])
+            logger.info(f"AI response stored for session {session_id}")
+            return ai_message
+        else:
+            raise chat_service_error(chat_response)
+    
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error calling chat service: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get AI response: {str(e)}")
+
+def chat_service_error(response) -> HTTPException:
+    """
+    Client errors and the chat service's own 504 (model timed out) keep their
+    status and detail; anything else is reported as a generic 500
+    """
+    if 400 <= response.status_code < 500 or response.status_code == 504:
+        try:
+            detail = response.json().get("detail")
+        except ValueError:
+            detail = None
+        return HTTPException(status_code=response.status_code, detail=detail or "Chat service error")
+    return HTTPException(status_code=500, detail="Chat service error")
+
+async def store_turn(session_id: str, user_content: str, ai_content: str) -> MessageResponse:
+    """
+    Store a user message and the AI response in one transaction, once the chat
+    service has answered (so a failed turn leaves no orphaned user message)
+    Returns: the stored AI message
+    """
+    created_at = timestamp()
+    ai_message = MessageResponse(
+        id=str(uuid.uuid4()),
+        session_id=session_id,
+        role="assistant",
+        content=ai_content,
+        created_at=created_at
+    )
+    # Same created_at for both; insertion order (rowid) keeps the user message first
+    await db.conn.executemany(
+        "INSERT INTO chat_messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (str(uuid.uuid4()), session_id, "user", user_content, created_at),
+            (ai_message.id, session_id, "assistant", ai_content, created_at)
+        ]
+    )
     await db.conn.execute(
-        "INSERT INTO chat_messages (id, session_id, role, content) VALUES (?, ?, ?, ?)",
-        (msg_id, session_id, "user", req.content)
+        "UPDATE chat_sessions SET message_count = message_count + 2 WHERE id = ?", (session_id,)
     )
     await db.conn.commit()
+    return ai_message
+
+def sse(payload: dict) -> str:
+    """One server-sent event carrying a JSON payload"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+@app.post("/api/chat/sessions/{session_id}/messages/stream")
+async def send_message_stream(session_id: str, req: SendMessageRequest, user_id: str = Depends(get_current_user)):
+    """
+    Streaming variant of send_message, as server-sent events: {"type": "token", "content": ...}
+    per chunk, then {"type": "done", ...MessageResponse fields} once the assistant
+    message is stored, or {"type": "error", "detail": ...}
+    """
+    # Verify session ownership
+    row = await db.fetchone(
+        "SELECT user_id, model, collection_id FROM chat_sessions WHERE id = ?", (session_id,)
+    )
     
-    logger.info(f"Message sent in session {session_id}")
+    if not row or row[0] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Call chat service to get AI response
-    try:
-        async with httpx.AsyncClient() as client:
-            chat_response = await client.post(
-                "http://localhost:8090/chat",
+    session_model = row[1] or "gpt-4"
+    
+    async def events():
+        try:
+            async with chat_service.stream(
+                "POST",
+                "/chat/stream",
                 json={
                     "session_id": session_id,
                     "message": req.content,
-                    "model": session_model
-                },
-                timeout=30.0
-            )
-            
-            if chat_response.status_code == 200:
-                ai_response = chat_response.json()
-                
-                # Store AI response
-                ai_msg_id = str(uuid.uuid4())
-                await db.conn.execute(
-                    "INSERT INTO chat_messages (id, session_id, role, content) VALUES (?, ?, ?, ?)",
-                    (ai_msg_id, session_id, "assistant", ai_response["message"])
-                )
-                await db.conn.commit()
-                
-                logger.info(f"AI response stored for session {session_id}")
-                
-                # Return the AI response
-                cursor = await db.conn.execute(
-                    "SELECT * FROM chat_messages WHERE id = ?", (ai_msg_id,)
-                )
-                ai_msg_row = await cursor.fetchone()
-                
-                return MessageResponse(
-                    id=ai_msg_row[0],
-                    session_id=ai_msg_row[1],
-                    role=ai_msg_row[2],
-                    content=ai_msg_row[3],
-                    created_at=ai_msg_row[5]
-                )
-            else:
-                raise HTTPException(status_code=500, detail="Chat service error")
+                    "model": session_model,
+                    "collection_id": row[2]
+                }
+            ) as upstream:
+                if upstream.status_code != 200:
+                    await upstream.aread()
+                    yield sse({"type": "error", "detail": chat_service_error(upstream).detail})
+                    return
                 
-    except Exception as e:
-        logger.error(f"Error calling chat service: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to get AI response: {str(e)}")
+                async for line in upstream.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: "):])
+                    if event["type"] != "done":
+                        yield sse(event)
+                        if event["type"] == "error":
+                            return
+                        continue
+                    
+                    # Store the turn with the complete AI response
+                    ai_message = await store_turn(session_id, req.content, event["message"])
+                    logger.info(f"Streamed AI response stored for session {session_id}")
+                    yield sse({"type": "done", **ai_message.model_dump()})
+        except UpstreamUnavailable as e:
+            yield sse({"type": "error", "detail": str(e)})
+        except Exception as e:
+            logger.error(f"Error streaming from chat service: {e}")
+            yield sse({"type": "error", "detail": f"Failed to get AI response: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 class UpdateModelRequest(BaseModel):
     model: str
@@ -583,10 +743,9 @@ class UpdateModelRequest(BaseModel):
 @app.patch("/api/chat/sessions/{session_id}/model")
 async def update_chat_model(session_id: str, req: UpdateModelRequest, user_id: str = Depends(get_current_user)):
     # Verify session ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT user_id FROM chat_sessions WHERE id = ?", (session_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -607,30 +766,35 @@ async def search_collection(
     collection_id: str,
     query: str,
     top_k: int = 5,
+    expand_neighbors: bool = False,
+    neighbor_window: int = Query(1, ge=0, le=config.MAX_NEIGHBOR_WINDOW),
+    doc_ids: Optional[List[str]] = Query(None),
+    filename: Optional[str] = None,
+    uploaded_after: Optional[str] = None,
+    uploaded_before: Optional[str] = None,
     user_id: str = Depends(get_current_user)
 ):
-    import chromadb
-    from libs.utils.config import config
-    from libs.model_router import get_model
+    from libs.model_router import model_router
+    from libs.vector_store import vector_store, CollectionNotFoundError
+    from libs.retrieval import (
+        SearchFilters, resolve_filters, embed_query,
+        expand_neighbors as expand_context,
+        RAG_SYSTEM_PROMPT, build_rag_prompt
+    )
     
     # Verify collection ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT owner_id FROM collections WHERE id = ?", (collection_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     try:
-        # Query ChromaDB
-        chroma_client = chromadb.HttpClient(host=config.CHROMA_HOST, port=config.CHROMA_PORT)
-        
         try:
-            collection = chroma_client.get_collection(name=f"collection_{collection_id}")
-            
-            # Check if collection has any documents
-            count = collection.count()
+            # Check if collection has any documents; vector store calls are
+            # blocking (disk and CPU-bound), so they run off the event loop
+            count = await asyncio.to_thread(vector_store.count, collection_id)
             if count == 0:
                 return {
                     "answer": "This collection is empty. Please upload and index some documents first.",
@@ -638,20 +802,37 @@ async def search_collection(
                     "query": query
                 }
             
-            results = collection.query(
-                query_texts=[query],
-                n_results=min(top_k, count)
+            # Resolve document filters in SQLite to a doc_id set for pushdown
+            filters = SearchFilters(
+                doc_ids=doc_ids,
+                filename=filename,
+                uploaded_after=uploaded_after,
+                uploaded_before=uploaded_before
+            )
+            filter_doc_ids, candidate_count = None, count
+            if not filters.is_empty():
+                async with db.reader() as reader:
+                    filter_doc_ids, candidate_count = await resolve_filters(reader, collection_id, filters)
+            
+            query_embedding = await embed_query(query)
+            hits = await asyncio.to_thread(
+                vector_store.search,
+                collection_id,
+                query_embedding,
+                min(top_k, count),
+                doc_ids=filter_doc_ids,
+                candidate_count=candidate_count
             )
             
             # Format results
-            formatted_results = []
-            if results['documents'] and len(results['documents']) > 0:
-                for i, doc in enumerate(results['documents'][0]):
-                    formatted_results.append({
-                        'text': doc,
-                        'score': 1 - results['distances'][0][i] if results['distances'] else 0,
-                        'metadata': results['metadatas'][0][i] if results['metadatas'] else {}
-                    })
+            formatted_results = [
+                {
+                    'text': hit['text'],
+                    'score': 1 - hit['distance'],
+                    'metadata': hit['metadata']
+                }
+                for hit in hits
+            ]
             
             if not formatted_results:
                 return {
@@ -660,33 +841,22 @@ async def search_collection(
                     "query": query
                 }
             
-            # Generate AI answer using RAG
-            context = "\n\n".join([r['text'] for r in formatted_results])
-            prompt = f"""Based on the following context, answer the question.
-
-Context:
-{context}
-
-Question: {query}
-
-Answer:"""
+            # Optionally widen each hit with its adjacent chunks from SQLite
+            if expand_neighbors:
+                async with db.reader() as reader:
+                    formatted_results = await expand_context(reader, formatted_results, neighbor_window)
             
-            # Use OpenAI directly for now
-            from openai import OpenAI
-            openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
-            
-            response = openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context."},
-                    {"role": "user", "content": prompt}
-                ],
+            # Generate AI answer using RAG
+            context = "\n\n".join([r.get('context', r['text']) for r in formatted_results])
+            answer = await model_router.complete(
+                build_rag_prompt(context, query),
+                task_type="rag",
+                user_preference="gpt-4",
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                system_prompt=RAG_SYSTEM_PROMPT
             )
             
-            answer = response.choices[0].message.content
-            
             logger.info(f"RAG search performed on collection {collection_id}")
             
             return {
@@ -696,14 +866,12 @@ Answer:"""
                 "total_chunks": count
             }
             
-        except Exception as e:
-            if "does not exist" in str(e).lower():
-                return {
-                    "answer": "This collection has not been initialized yet. Please upload and index some documents first.",
-                    "results": [],
-                    "query": query
-                }
-            raise
+        except CollectionNotFoundError:
+            return {
+                "answer": "This collection has not been initialized yet. Please upload and index some documents first.",
+                "results": [],
+                "query": query
+            }
         
     except Exception as e:
         logger.error(f"RAG search error: {e}")
@@ -714,12 +882,15 @@ Answer:"""
 async def get_stock_quote(symbol: str):
     """Get real-time stock quote from stock producer service"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"http://localhost:8085/quote/{symbol}")
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch quote")
+        response = await stock_producer.request("GET", f"/quote/{symbol}")
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(status_code=response.status_code, detail="Failed to fetch quote")
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching stock quote: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -728,9 +899,10 @@ async def get_stock_quote(symbol: str):
 async def start_stock_stream():
     """Start streaming stock data from Alpha Vantage"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post("http://localhost:8085/start-stream")
-            return response.json()
+        response = await stock_producer.request("POST", "/start-stream")
+        return response.json()
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error starting stock stream: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -739,9 +911,10 @@ async def start_stock_stream():
 async def stop_stock_stream():
     """Stop streaming stock data"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post("http://localhost:8085/stop-stream")
-            return response.json()
+        response = await stock_producer.request("POST", "/stop-stream")
+        return response.json()
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error stopping stock stream: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -750,9 +923,10 @@ async def stop_stock_stream():
 async def get_stream_status():
     """Get streaming status"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://localhost:8085/stream-status")
-            return response.json()
+        response = await stock_producer.request("GET", "/stream-status")
+        return response.json()
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting stream status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -796,10 +970,9 @@ async def create_task(req: CreateTaskRequest, user_id: str = Depends(get_current
     )
     await db.conn.commit()
     
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT * FROM tasks WHERE id = ?", (task_id,)
     )
-    row = await cursor.fetchone()
     
     logger.info(f"Task created: {task_id}")
     return TaskResponse(
@@ -816,10 +989,9 @@ async def create_task(req: CreateTaskRequest, user_id: str = Depends(get_current
 
 @app.get("/api/tasks")
 async def list_tasks(user_id: str = Depends(get_current_user)):
-    cursor = await db.conn.execute(
+    rows = await db.fetchall(
         "SELECT * FROM tasks WHERE user_id = ? ORDER BY created_at DESC", (user_id,)
     )
-    rows = await cursor.fetchall()
     
     return [
         TaskResponse(
@@ -839,10 +1011,9 @@ async def list_tasks(user_id: str = Depends(get_current_user)):
 @app.patch("/api/tasks/{task_id}", response_model=TaskResponse)
 async def update_task(task_id: str, req: UpdateTaskRequest, user_id: str = Depends(get_current_user)):
     # Verify task ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT user_id FROM tasks WHERE id = ?", (task_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -879,10 +1050,9 @@ async def update_task(task_id: str, req: UpdateTaskRequest, user_id: str = Depen
         await db.conn.commit()
     
     # Return updated task
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT * FROM tasks WHERE id = ?", (task_id,)
     )
-    row = await cursor.fetchone()
     
     logger.info(f"Task updated: {task_id}")
     return TaskResponse(
@@ -900,10 +1070,9 @@ async def update_task(task_id: str, req: UpdateTaskRequest, user_id: str = Depen
 @app.delete("/api/tasks/{task_id}")
 async def delete_task(task_id: str, user_id: str = Depends(get_current_user)):
     # Verify task ownership
-    cursor = await db.conn.execute(
+    row = await db.fetchone(
         "SELECT user_id FROM tasks WHERE id = ?", (task_id,)
     )
-    row = await cursor.fetchone()
     
     if not row or row[0] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -947,7 +1116,6 @@ async def websocket_stocks(websocket: WebSocket):
     try:
         # Start consuming from Kafka in background
         from kafka import KafkaConsumer
-        from libs.utils.config import config
         import asyncio
         
         consumer = KafkaConsumer(
@@ -989,5 +1157,4 @@ async def websocket_stocks(websocket: WebSocket):
 
 if __name__ == "__main__":
     import uvicorn
-    from libs.utils.config import config
     uvicorn.run(app, host="0.0.0.0", port=config.API_GATEWAY_PORT)
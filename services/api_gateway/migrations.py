@@ -0,0 +1,96 @@
+"""
+Versioned schema migrations for the gateway database
+
+init_schema creates missing tables at their current shape; migrations bring
+existing databases up to date (columns added since, indexes). The applied
+version is kept in PRAGMA user_version and each migration runs in its own
+transaction, so a failed migration leaves the database at the previous version.
+Migrations must be safe on a freshly created schema too.
+
+Runs on gateway startup, or by hand: python -m services.api_gateway.migrations
+"""
+import asyncio
+import aiosqlite
+from typing import Awaitable, Callable, List, Tuple
+from libs.utils.logging import setup_logger
+
+logger = setup_logger("migrations")
+
+async def _columns(conn: aiosqlite.Connection, table: str) -> List[str]:
+    cursor = await conn.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in await cursor.fetchall()]
+
+async def add_user_names(conn: aiosqlite.Connection) -> None:
+    columns = await _columns(conn, "users")
+    for column in ("first_name", "last_name"):
+        if column not in columns:
+            await conn.execute(f"ALTER TABLE users ADD COLUMN {column} TEXT")
+
+async def add_chat_message_count(conn: aiosqlite.Connection) -> None:
+    if "message_count" in await _columns(conn, "chat_sessions"):
+        return
+    await conn.execute("ALTER TABLE chat_sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0")
+    await conn.execute("""
+        UPDATE chat_sessions SET message_count = (
+            SELECT COUNT(*) FROM chat_messages WHERE chat_messages.session_id = chat_sessions.id
+        )
+    """)
+
+async def add_query_indexes(conn: aiosqlite.Connection) -> None:
+    # collections.owner_id is served by the UNIQUE(owner_id, name) index and
+    # chunks.doc_id by idx_chunks_doc_offset
+    for statement in (
+        # list_documents: covers the filter, the sort and every selected column
+        "CREATE INDEX IF NOT EXISTS idx_documents_collection_created "
+        "ON documents(collection_id, created_at, id, filename, status)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_created ON chat_sessions(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created ON chat_messages(session_id, created_at)",
+    ):
+        await conn.execute(statement)
+
+# (version, description, migration); append only, never renumber
+MIGRATIONS: List[Tuple[int, str, Callable[[aiosqlite.Connection], Awaitable[None]]]] = [
+    (1, "users.first_name and users.last_name", add_user_names),
+    (2, "chat_sessions.message_count, backfilled", add_chat_message_count),
+    (3, "indexes for the gateway's hot queries", add_query_indexes),
+]
+
+async def schema_version(conn: aiosqlite.Connection) -> int:
+    cursor = await conn.execute("PRAGMA user_version")
+    return (await cursor.fetchone())[0]
+
+async def migrate(conn: aiosqlite.Connection) -> int:
+    """
+    Apply every migration newer than the database's version
+    Returns: the resulting schema version
+    """
+    version = await schema_version(conn)
+    for target, description, apply in MIGRATIONS:
+        if target <= version:
+            continue
+        # Explicit transaction: sqlite3 wouldn't open one implicitly for DDL
+        await conn.commit()
+        await conn.execute("BEGIN")
+        try:
+            await apply(conn)
+            await conn.execute(f"PRAGMA user_version = {target}")
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            logger.error(f"Migration {target} ({description}) failed")
+            raise
+        version = target
+        logger.info(f"Applied migration {target}: {description}")
+    return version
+
+async def main() -> None:
+    from .database import db
+
+    # connect() creates missing tables and runs the migrations
+    await db.connect()
+    logger.info(f"Database {db.db_path} is at schema version {await schema_version(db.conn)}")
+    await db.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+import time
+import httpx
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from libs.utils.config import config
+from libs.utils.logging import setup_logger
+from libs.utils.metrics import upstream_requests_total, upstream_circuit_open
+
+try:
+    import h2  # noqa: F401  enables HTTP/2 in httpx
+except ImportError:
+    h2 = None
+
+logger = setup_logger("upstream")
+
+# Responses that mean the service itself is down or overloaded. Other 5xx (the
+# chat service's 500 for an LLM error, its 504 for a model timeout) come from a
+# working service reporting on its own dependencies, so they don't trip the breaker.
+FAILURE_STATUSES = {502, 503}
+
+class UpstreamUnavailable(Exception):
+    """The upstream's circuit is open; the request was not sent"""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} is unavailable")
+        self.name = name
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects requests for
+    `reset_seconds`; then lets one trial request through (half-open), which
+    closes the circuit on success or reopens it on failure
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.trial_in_flight or time.monotonic() - self.opened_at < self.reset_seconds:
+            return False
+        self.trial_in_flight = True
+        return True
+
+    def release_trial(self) -> None:
+        """Let another trial through after one ended without a verdict"""
+        self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"Circuit closed for {self.name}")
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        upstream_circuit_open.labels(upstream=self.name).set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit opened for {self.name} after {self.failures} failures")
+            self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+            upstream_circuit_open.labels(upstream=self.name).set(1)
+
+class UpstreamPool:
+    """
+    Application-lifetime httpx.AsyncClient shared by every upstream, so calls
+    reuse kept-alive connections (HTTP/2 when h2 is installed and the upstream
+    negotiates it) instead of connecting per request
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=h2 is not None,
+                limits=httpx.Limits(
+                    max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS
+                )
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+pool = UpstreamPool()
+
+class Upstream:
+    """A backend service called through the shared pool, with its own timeout and circuit breaker"""
+
+    def __init__(self, name: str, base_url: str, timeout: float):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=config.UPSTREAM_CONNECT_TIMEOUT_SECONDS)
+        self.breaker = CircuitBreaker(
+            name, config.UPSTREAM_BREAKER_FAILURES, config.UPSTREAM_BREAKER_RESET_SECONDS
+        )
+
+    def _check(self) -> None:
+        if not self.breaker.allow():
+            upstream_requests_total.labels(upstream=self.name, outcome="rejected").inc()
+            raise UpstreamUnavailable(self.name)
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Send a request; connection errors, timeouts and FAILURE_STATUSES responses count as failures
+        Raises: UpstreamUnavailable while the circuit is open, httpx.HTTPError on transport errors
+        """
+        self._check()
+        kwargs.setdefault("timeout", self.timeout)
+        ok = None
+        try:
+            response = await pool.client.request(method, f"{self.base_url}{path}", **kwargs)
+            ok = response.status_code not in FAILURE_STATUSES
+            return response
+        except httpx.HTTPError:
+            ok = False
+            raise
+        finally:
+            self._finish(ok)
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streaming request, judged like request() once the caller is done with the body"""
+        self._check()
+        kwargs.setdefault("timeout", self.timeout)
+        ok = None
+        try:
+            async with pool.client.stream(method, f"{self.base_url}{path}", **kwargs) as response:
+                yield response
+            ok = response.status_code not in FAILURE_STATUSES
+        except httpx.HTTPError:
+            ok = False
+            raise
+        finally:
+            self._finish(ok)
+
+    def _finish(self, ok: Optional[bool]) -> None:
+        if ok is None:
+            # Cancelled (the client went away) or failed on our side: says nothing about the upstream
+            self.breaker.release_trial()
+            return
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        upstream_requests_total.labels(upstream=self.name, outcome="ok" if ok else "error").inc()
+
+chat_service = Upstream("chat-service", config.CHAT_SERVICE_URL, config.CHAT_SERVICE_TIMEOUT_SECONDS)
+stock_producer = Upstream("stock-producer", config.STOCK_PRODUCER_URL, config.STOCK_PRODUCER_TIMEOUT_SECONDS)
@@ -27,16 +27,13 @@ celery_app.conf.update(
 
 @celery_app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True)
 def ingest_document_task(self, doc_id: str, collection_id: str, object_name: str):
-    """Complete PDF ingestion pipeline: download, extract, chunk, embed, store in ChromaDB"""
+    """Complete PDF ingestion pipeline: download, extract, chunk, embed, store in the vector store"""
     import tempfile
     import os
     from minio import Minio
     from pdfminer.high_level import extract_text
     import asyncio
     import aiosqlite
-    import chromadb
-    from openai import OpenAI
-    import uuid
     
     try:
         logger.info(f"Starting ingestion for document {doc_id}")
@@ -64,72 +61,11 @@ def ingest_document_task(self, doc_id: str, collection_id: str, object_name: str
         
         logger.info(f"Extracted {len(text)} characters from PDF")
         
-        # 3. Chunk text
-        chunks = semantic_chunk(text)
-        logger.info(f"Created {len(chunks)} chunks")
-        
-        # 4. Store chunks in SQLite
-        async def store_chunks():
-            async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
-                chunk_ids = []
-                for chunk in chunks:
-                    chunk_id = str(uuid.uuid4())
-                    chunk_ids.append(chunk_id)
-                    await conn.execute(
-                        "INSERT INTO chunks (id, doc_id, text, tokens, offset) VALUES (?, ?, ?, ?, ?)",
-                        (chunk_id, doc_id, chunk['text'], chunk['tokens'], chunk['offset'])
-                    )
-                await conn.commit()
-                return chunk_ids
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        chunk_ids = loop.run_until_complete(store_chunks())
-        loop.close()
-        
-        # 5. Generate embeddings
-        openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
-        texts = [chunk['text'] for chunk in chunks]
+        # 3-7. Chunk, store, embed and index
+        chunk_count = index_document(doc_id, collection_id, text)
         
-        response = openai_client.embeddings.create(
-            model="text-embedding-ada-002",
-            input=texts
-        )
-        embeddings = [item.embedding for item in response.data]
-        logger.info(f"Generated {len(embeddings)} embeddings")
-        
-        # 6. Store in ChromaDB
-        chroma_client = chromadb.HttpClient(host=config.CHROMA_HOST, port=config.CHROMA_PORT)
-        collection = chroma_client.get_or_create_collection(f"collection_{collection_id}")
-        
-        collection.add(
-            ids=chunk_ids,
-            embeddings=embeddings,
-            metadatas=[{
-                "chunk_id": chunk_id,
-                "doc_id": doc_id,
-                "collection_id": collection_id
-            } for chunk_id in chunk_ids],
-            documents=texts
-        )
-        logger.info(f"Stored {len(chunk_ids)} chunks in ChromaDB")
-        
-        # 7. Update document status
-        async def update_status():
-            async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
-                await conn.execute(
-                    "UPDATE documents SET status = 'indexed' WHERE id = ?",
-                    (doc_id,)
-                )
-                await conn.commit()
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(update_status())
-        loop.close()
-        
-        logger.info(f"Ingestion completed for {doc_id}: {len(chunks)} chunks indexed")
-        return {"doc_id": doc_id, "chunks": len(chunks), "status": "indexed"}
+        logger.info(f"Ingestion completed for {doc_id}: {chunk_count} chunks indexed")
+        return {"doc_id": doc_id, "chunks": chunk_count, "status": "indexed"}
         
     except Exception as e:
         logger.error(f"Ingestion task failed for {doc_id}: {e}", exc_info=True)
@@ -153,6 +89,72 @@ def ingest_document_task(self, doc_id: str, collection_id: str, object_name: str
         
         raise
 
+def index_document(doc_id: str, collection_id: str, text: str) -> int:
+    """Chunk extracted text, store chunks in SQLite, embed them and add them to the vector store"""
+    import asyncio
+    import aiosqlite
+    import uuid
+    from libs.retrieval import embed_texts
+    from libs.vector_store import vector_store
+    
+    # 3. Chunk text
+    chunks = semantic_chunk(text)
+    logger.info(f"Created {len(chunks)} chunks")
+    
+    # 4. Store chunks in SQLite
+    async def store_chunks():
+        async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
+            chunk_ids = []
+            for chunk in chunks:
+                chunk_id = str(uuid.uuid4())
+                chunk_ids.append(chunk_id)
+                await conn.execute(
+                    "INSERT INTO chunks (id, doc_id, text, tokens, offset) VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, doc_id, chunk['text'], chunk['tokens'], chunk['offset'])
+                )
+            await conn.commit()
+            return chunk_ids
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    chunk_ids = loop.run_until_complete(store_chunks())
+    loop.close()
+    
+    # 5. Generate embeddings
+    texts = [chunk['text'] for chunk in chunks]
+    embeddings = embed_texts(texts)
+    logger.info(f"Generated {len(embeddings)} embeddings")
+    
+    # 6. Store in vector store
+    vector_store.add(
+        collection_id,
+        ids=chunk_ids,
+        embeddings=embeddings,
+        metadatas=[{
+            "chunk_id": chunk_id,
+            "doc_id": doc_id,
+            "collection_id": collection_id
+        } for chunk_id in chunk_ids],
+        documents=texts
+    )
+    logger.info(f"Stored {len(chunk_ids)} chunks in vector store")
+    
+    # 7. Update document status
+    async def update_status():
+        async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
+            await conn.execute(
+                "UPDATE documents SET status = 'indexed' WHERE id = ?",
+                (doc_id,)
+            )
+            await conn.commit()
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(update_status())
+    loop.close()
+    
+    return len(chunks)
+
 def semantic_chunk(text: str, max_tokens: int = 512, overlap: int = 50):
     """Simple semantic chunking by sentences"""
     sentences = text.split('. ')
@@ -200,12 +202,79 @@ def embed_chunks_task(self, chunk_ids: list, collection_id: str):
         logger.error(f"Embedding task failed: {e}", exc_info=True)
         raise
 
+# Chunks summarized together in the map step of summarize_document
+SUMMARY_SECTION_CHUNKS = 8
+SECTION_SUMMARY_PROMPT = "Summarize the document section in the user's message concisely."
+COMBINE_SUMMARY_PROMPT = "Combine the section summaries in the user's message into one coherent document summary."
+
+async def summarize_document(doc_id: str) -> str:
+    """Map-reduce summary: batch-summarize sections of chunks, then combine them"""
+    import uuid
+    import aiosqlite
+    from libs.model_router import ModelRouter
+    
+    async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
+        cursor = await conn.execute(
+            "SELECT text FROM chunks WHERE doc_id = ? ORDER BY offset", (doc_id,)
+        )
+        texts = [row[0] for row in await cursor.fetchall()]
+    if not texts:
+        raise ValueError(f"Document {doc_id} has no chunks to summarize")
+    
+    # Each task runs its own event loop, so it gets its own router (clients bind to a loop)
+    router = ModelRouter()
+    sections = [
+        "\n\n".join(texts[i:i + SUMMARY_SECTION_CHUNKS])
+        for i in range(0, len(texts), SUMMARY_SECTION_CHUNKS)
+    ]
+    results = await router.complete_batch(
+        sections,
+        task_type="summarization",
+        max_tokens=300,
+        system_prompt=SECTION_SUMMARY_PROMPT
+    )
+    partials = [r.text for r in results if r.ok]
+    if not partials:
+        raise results[0].error
+    if len(partials) < len(sections):
+        logger.warning(f"{len(sections) - len(partials)} of {len(sections)} sections failed to summarize for {doc_id}")
+    
+    if len(partials) == 1:
+        combined = next(r for r in results if r.ok)
+    else:
+        combined, = await router.complete_batch(
+            ["\n\n".join(partials)],
+            task_type="summarization",
+            max_tokens=500,
+            system_prompt=COMBINE_SUMMARY_PROMPT
+        )
+        if not combined.ok:
+            raise combined.error
+    # Recorded as the model that wrote the final text, which failover may have changed
+    summary, model = combined.text, combined.model
+    
+    summary_id = str(uuid.uuid4())
+    async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
+        await conn.execute(
+            "INSERT INTO summaries (id, doc_id, content, model) VALUES (?, ?, ?, ?)",
+            (summary_id, doc_id, summary, model)
+        )
+        await conn.execute(
+            "UPDATE documents SET summary_id = ? WHERE id = ?", (summary_id, doc_id)
+        )
+        await conn.commit()
+    return summary_id
+
 @celery_app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True)
 def summarize_document_task(self, doc_id: str):
     """Generate document summary"""
+    import asyncio
+    
     try:
         logger.info(f"Summarization task started for {doc_id}")
-        return {"doc_id": doc_id}
+        summary_id = asyncio.run(summarize_document(doc_id))
+        logger.info(f"Stored summary {summary_id} for {doc_id}")
+        return {"doc_id": doc_id, "summary_id": summary_id}
     except Exception as e:
         logger.error(f"Summarization task failed: {e}", exc_info=True)
         raise
@@ -0,0 +1,119 @@
+import asyncio
+import numpy as np
+from typing import List, Optional
+from libs.model_router import model_router
+from libs.retrieval import (
+    embed_query, RAG_SYSTEM_PROMPT, QUERY_REWRITE_SYSTEM_PROMPT, build_rag_prompt, build_rewrite_prompt
+)
+from libs.utils.config import config
+from libs.utils.logging import setup_logger
+from libs.utils.metrics import chat_retrievals_total
+from libs.vector_store import vector_store, CollectionNotFoundError
+from .memory import conversation
+from .session_store import ChatSession, LRU
+
+logger = setup_logger("chat-grounding")
+
+class Retrieval:
+    """Chunks retrieved for a session and the query embedding that fetched them"""
+
+    def __init__(self, collection_id: str, embedding: np.ndarray, chunks: List[dict]):
+        self.collection_id = collection_id
+        self.embedding = embedding
+        self.chunks = chunks
+        self.reuses = 0
+
+# Latest retrieval per session; a miss (another replica, restart) costs one search
+_retrievals = LRU(config.CHAT_SESSION_CACHE_SIZE, config.CHAT_SESSION_TTL_SECONDS)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    norms = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b)) / norms if norms else 0.0
+
+async def rewrite_query(session: ChatSession, message: str) -> str:
+    """
+    Follow-up message rewritten as a standalone query using the recent turns
+    Returns: the message itself on a first turn or if the rewrite fails
+    """
+    history = conversation(session)[-2 * config.CHAT_RAG_REWRITE_TURNS:]
+    if not history:
+        return message
+    try:
+        query = await model_router.complete(
+            build_rewrite_prompt(history, message),
+            task_type="query_rewrite",
+            temperature=0.0,
+            max_tokens=100,
+            system_prompt=QUERY_REWRITE_SYSTEM_PROMPT
+        )
+    except Exception as e:
+        logger.warning(f"Query rewrite failed for session {session.session_id}: {e}")
+        return message
+    return query.strip() or message
+
+async def retrieve(session: ChatSession, collection_id: str, message: str) -> List[dict]:
+    """
+    Chunks from the session's collection for this turn
+
+    The previous turn's chunks are reused while the rewritten query stays close
+    to the query that fetched them (same topic), for at most CHAT_RAG_MAX_REUSE
+    turns; otherwise the collection is searched again.
+    Returns: [{"text", "metadata", "score"}, ...], empty if nothing could be retrieved
+    """
+    try:
+        query = await rewrite_query(session, message)
+        query_embedding = await embed_query(query)
+        embedding = np.asarray(query_embedding, dtype=np.float32)
+
+        previous: Optional[Retrieval] = _retrievals.get(session.session_id)
+        if previous is not None and previous.collection_id == collection_id \
+                and previous.reuses < config.CHAT_RAG_MAX_REUSE \
+                and similarity(embedding, previous.embedding) >= config.CHAT_RAG_REUSE_SIMILARITY:
+            previous.reuses += 1
+            chat_retrievals_total.labels(result="reuse").inc()
+            return previous.chunks
+
+        try:
+            # Local-store searches are CPU-bound; keep them off the event loop
+            hits = await asyncio.to_thread(
+                vector_store.search, collection_id, query_embedding, config.CHAT_RAG_TOP_K
+            )
+        except CollectionNotFoundError:
+            hits = []
+        chunks = [
+            {"text": hit["text"], "metadata": hit["metadata"], "score": 1 - hit["distance"]}
+            for hit in hits
+        ]
+    except Exception as e:
+        # Answer ungrounded rather than fail the turn
+        logger.warning(f"Retrieval failed for session {session.session_id}: {e}")
+        chat_retrievals_total.labels(result="failed").inc()
+        return []
+
+    _retrievals.put(session.session_id, Retrieval(collection_id, embedding, chunks))
+    chat_retrievals_total.labels(result="search" if chunks else "empty").inc()
+    logger.info(f"Retrieved {len(chunks)} chunks from collection {collection_id} for session {session.session_id}")
+    return chunks
+
+def ground(context: List[dict], chunks: List[dict]) -> List[dict]:
+    """
+    Context messages with the retrieved chunks added to the current turn only:
+    RAG_SYSTEM_PROMPT after the leading system messages (keeping the cacheable
+    prefix fixed) and the chunks wrapped around the final user message
+    """
+    if not chunks:
+        return context
+    leading = 0
+    while leading < len(context) and context[leading]["role"] == "system":
+        leading += 1
+    question = context[-1]["content"]
+    return (
+        context[:leading]
+        + [{"role": "system", "content": RAG_SYSTEM_PROMPT}]
+        + context[leading:-1]
+        + [{"role": "user", "content": build_rag_prompt("\n\n".join(c["text"] for c in chunks), question)}]
+    )
+
+def forget(session_id: str) -> None:
+    """Drop a session's cached retrieval"""
+    _retrievals.pop(session_id)
@@ -0,0 +1,43 @@
+import aiosqlite
+from typing import Optional
+from libs.retrieval import CHAT_SYSTEM_PROMPT
+from libs.utils.config import config
+from .session_store import ChatSession
+
+# Newest messages first, then flipped back to chronological order; rowid breaks
+# ties between a user message and its reply written in the same second
+HISTORY_QUERY = """
+    SELECT role, content FROM (
+        SELECT role, content, created_at, rowid FROM chat_messages
+        WHERE session_id = ?
+        ORDER BY created_at DESC, rowid DESC
+        LIMIT ?
+    )
+    ORDER BY created_at, rowid
+"""
+
+async def load_session(session_id: str) -> Optional[ChatSession]:
+    """
+    Rebuild a session from the gateway's chat_sessions and chat_messages tables,
+    the durable record of every conversation; the session store only caches it
+    Returns: None if the gateway has no such session
+    """
+    async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
+        cursor = await conn.execute(
+            "SELECT model, created_at FROM chat_sessions WHERE id = ?", (session_id,)
+        )
+        session_row = await cursor.fetchone()
+        if session_row is None:
+            return None
+        cursor = await conn.execute(HISTORY_QUERY, (session_id, config.CHAT_HISTORY_LOAD_LIMIT))
+        rows = await cursor.fetchall()
+
+    return ChatSession(
+        session_id=session_id,
+        model=session_row[0] or "gpt-4",
+        created_at=str(session_row[1]),
+        system_prompt=CHAT_SYSTEM_PROMPT,
+        messages=[{"role": "system", "content": CHAT_SYSTEM_PROMPT}] + [
+            {"role": role, "content": content} for role, content in rows if role in ("user", "assistant")
+        ]
+    )
@@ -1,29 +1,43 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List
-import uuid
+from typing import Optional, List, AsyncIterator
 from datetime import datetime
+import json
+import time
+import asyncio
 
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from libs.utils.logging import setup_logger
 from libs.utils.config import config
+from libs.model_adapter import client_registry
+from libs.utils.metrics import llm_cached_tokens_total
+from .session_store import ChatSession, session_store
+from .memory import build_context, refresh_summary
+from .history import load_session
+from .grounding import retrieve, ground, forget
 
 logger = setup_logger("chat-service")
 
 app = FastAPI(title="Chat Service")
 
-# In-memory storage for chat sessions and their message histories
-chat_sessions: Dict[str, ChatMessageHistory] = {}
-session_metadata: Dict[str, dict] = {}
+MESSAGE_TYPES = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+
+# How often a pending completion checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    """The caller went away before the response was ready"""
 
 
 class ChatRequest(BaseModel):
     session_id: str
     message: str
-    model: Optional[str] = "gpt-4"
+    # Overrides the session's model (the gateway sends its current choice)
+    model: Optional[str] = None
+    # Collection the session is bound to; its chunks ground each turn
+    collection_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
@@ -44,6 +58,95 @@ class SessionResponse(BaseModel):
     created_at: str
 
 
+def to_langchain(messages: List[dict]) -> List[BaseMessage]:
+    """Stored {"role", "content"} messages as LangChain messages"""
+    return [MESSAGE_TYPES[m["role"]](content=m["content"]) for m in messages]
+
+
+async def get_session(session_id: str) -> Optional[ChatSession]:
+    """Session from the store, loaded from the gateway database on a miss"""
+    session = await session_store.get(session_id)
+    if session is None:
+        session = await load_session(session_id)
+        if session is not None:
+            await session_store.create(session)
+            logger.info(f"Loaded chat session {session_id} from the database ({len(session.messages)} messages)")
+    return session
+
+
+def select_llm(model_name: str):
+    """
+    Shared LangChain chat model for a session's model
+    Returns: (provider, llm)
+    """
+    # Chat models are shared across requests so HTTP connections are reused
+    if model_name in ["gemini-pro", "gemini-1.5-pro", "gemini-1.5-flash"]:
+        # Use Gemini
+        return "gemini", client_registry.chat_model(
+            "gemini",
+            model_name if model_name != "gemini-pro" else "gemini-1.5-pro",
+            temperature=0.7
+        )
+    # Use OpenAI (default)
+    return "openai", client_registry.chat_model("openai", model_name, temperature=0.7)
+
+
+def sse(payload: dict) -> str:
+    """One server-sent event carrying a JSON payload"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def run_cancellable(request: Request, coro, timeout: float):
+    """
+    Await coro, cancelling it once timeout passes or the client disconnects
+    Raises: asyncio.TimeoutError, ClientDisconnected
+    """
+    task = asyncio.ensure_future(coro)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_SECONDS, remaining))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
+
+
+async def with_timeouts(stream: AsyncIterator, idle_timeout: float, total_timeout: float) -> AsyncIterator:
+    """
+    Re-yield stream, raising asyncio.TimeoutError when the next chunk (the first
+    included) takes longer than idle_timeout or the stream outlasts total_timeout
+    """
+    iterator = stream.__aiter__()
+    deadline = time.monotonic() + total_timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=min(idle_timeout, remaining))
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        # Closes the upstream HTTP stream on timeout or cancellation too
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+def record_cached_tokens(provider: str, model: str, response) -> None:
+    """Count input tokens the provider served from its prompt cache"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    llm_cached_tokens_total.labels(provider=provider, model=model).inc(cached)
+
+
 @app.get("/health")
 async def health():
     return {"status": "healthy", "service": "chat-service"}
@@ -58,72 +161,69 @@ class CreateSessionWithIdRequest(BaseModel):
 @app.post("/sessions", response_model=SessionResponse)
 async def create_session(req: CreateSessionWithIdRequest):
     """Create a new chat session with memory using provided session_id"""
-    session_id = req.session_id
-    
-    # Initialize message history for this session
-    chat_sessions[session_id] = ChatMessageHistory()
-    
-    # Store session metadata
-    session_metadata[session_id] = {
-        "model": req.model or "gpt-4",
-        "created_at": datetime.utcnow().isoformat(),
-        "system_prompt": req.system_prompt
-    }
-    
-    # Add system message if provided
-    if req.system_prompt:
-        chat_sessions[session_id].add_message(SystemMessage(content=req.system_prompt))
+    session = ChatSession(
+        session_id=req.session_id,
+        model=req.model or "gpt-4",
+        created_at=datetime.utcnow().isoformat(),
+        system_prompt=req.system_prompt,
+        # The system message opens the history when provided
+        messages=[{"role": "system", "content": req.system_prompt}] if req.system_prompt else []
+    )
+    await session_store.create(session)
     
-    logger.info(f"Created chat session: {session_id} with model {req.model}")
+    logger.info(f"Created chat session: {session.session_id} with model {req.model}")
     
     return SessionResponse(
-        session_id=session_id,
-        model=req.model or "gpt-4",
-        created_at=session_metadata[session_id]["created_at"]
+        session_id=session.session_id,
+        model=session.model,
+        created_at=session.created_at
     )
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request, background_tasks: BackgroundTasks):
     """Send a message and get AI response with conversation memory"""
     
-    if req.session_id not in chat_sessions:
+    session = await get_session(req.session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
     try:
-        # Get session info
-        metadata = session_metadata[req.session_id]
-        history = chat_sessions[req.session_id]
-        
-        # Add user message to history
-        history.add_user_message(req.message)
+        user_message = {"role": "user", "content": req.message}
         
         # Initialize LLM based on model
-        model_name = metadata["model"]
+        model_name = req.model or session.model
+        provider, llm = select_llm(model_name)
         
-        if model_name in ["gemini-pro", "gemini-1.5-pro", "gemini-1.5-flash"]:
-            # Use Gemini
-            llm = ChatGoogleGenerativeAI(
-                model=model_name if model_name != "gemini-pro" else "gemini-1.5-pro",
-                temperature=0.7,
-                google_api_key=config.GEMINI_API_KEY
-            )
-        else:
-            # Use OpenAI (default)
-            llm = ChatOpenAI(
-                model=model_name,
-                temperature=0.7,
-                openai_api_key=config.OPENAI_API_KEY
-            )
+        # System prompt, rolling summary and the recent window; the prefix stays
+        # unchanged between summaries, so the provider can serve it from its prompt cache
+        context, needs_summary = build_context(session, user_message)
         
-        # Get all messages from history
-        messages = history.messages
+        async def respond():
+            grounded = context
+            if req.collection_id:
+                grounded = ground(context, await retrieve(session, req.collection_id, req.message))
+            return await llm.ainvoke(to_langchain(grounded))
         
-        # Get AI response
-        response = llm.invoke(messages)
+        # Get AI response without blocking the event loop; give up on timeout or
+        # once the caller has gone, instead of paying for a completion nobody reads
+        try:
+            response = await run_cancellable(request, respond(), config.CHAT_REQUEST_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat response timed out for session {req.session_id}")
+            raise HTTPException(status_code=504, detail="Model response timed out")
+        except ClientDisconnected:
+            logger.info(f"Client disconnected, cancelled chat for session {req.session_id}")
+            return Response(status_code=499)
+        record_cached_tokens(provider, model_name, response)
         
-        # Add AI response to history
-        history.add_ai_message(response.content)
+        # Save the turn once it has an answer
+        await session_store.append(
+            req.session_id, [user_message, {"role": "assistant", "content": response.content}]
+        )
+        if needs_summary:
+            # Runs after the response is sent
+            background_tasks.add_task(refresh_summary, session_store, req.session_id)
         
         logger.info(f"Chat response generated for session {req.session_id}")
         
@@ -134,40 +234,111 @@ async def chat(req: ChatRequest):
             timestamp=datetime.utcnow().isoformat()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, background_tasks: BackgroundTasks):
+    """
+    Send a message and stream the AI response as server-sent events:
+    {"type": "token", "content": ...} per chunk, then {"type": "done", "message": ..., "timestamp": ...}
+    or {"type": "error", "detail": ...}. The turn is saved once the stream completes.
+    """
+    session = await get_session(req.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    user_message = {"role": "user", "content": req.message}
+    model_name = req.model or session.model
+    provider, llm = select_llm(model_name)
+    context, needs_summary = build_context(session, user_message)
+    
+    async def generate():
+        # Retrieval (query rewrite and embedding) runs under the stream's timeouts too
+        grounded = context
+        if req.collection_id:
+            grounded = ground(context, await retrieve(session, req.collection_id, req.message))
+        model_stream = llm.astream(to_langchain(grounded))
+        try:
+            async for chunk in model_stream:
+                yield chunk
+        finally:
+            await model_stream.aclose()
+    
+    async def events():
+        parts = []
+        final = None
+        stream = with_timeouts(
+            generate(),
+            config.CHAT_STREAM_IDLE_TIMEOUT_SECONDS,
+            config.CHAT_REQUEST_TIMEOUT_SECONDS
+        )
+        try:
+            async for chunk in stream:
+                # Chunks add up to one message carrying the usage metadata
+                final = chunk if final is None else final + chunk
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield sse({"type": "token", "content": chunk.content})
+        except asyncio.CancelledError:
+            # Client disconnected: the model stream is closed and the partial turn discarded
+            logger.info(f"Client disconnected, cancelled chat stream for session {req.session_id}")
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat stream timed out for session {req.session_id}")
+            yield sse({"type": "error", "detail": "Model response timed out"})
+            return
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}")
+            yield sse({"type": "error", "detail": str(e)})
+            return
+        
+        content = "".join(parts)
+        record_cached_tokens(provider, model_name, final)
+        await session_store.append(
+            req.session_id, [user_message, {"role": "assistant", "content": content}]
+        )
+        if needs_summary:
+            # Only once the turn is stored; runs after the stream finishes
+            background_tasks.add_task(refresh_summary, session_store, req.session_id)
+        logger.info(f"Chat response streamed for session {req.session_id}")
+        yield sse({"type": "done", "message": content, "timestamp": datetime.utcnow().isoformat()})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/sessions/{session_id}/history")
-async def get_history(session_id: str):
-    """Get conversation history for a session"""
+async def get_history(
+    session_id: str,
+    before: Optional[int] = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """
+    Get a page of conversation history, oldest first; pass next_cursor back as
+    `before` for the previous page
+    """
     
-    if session_id not in chat_sessions:
+    page = await session_store.get_messages(session_id, before, limit)
+    if page is None and await get_session(session_id) is not None:
+        page = await session_store.get_messages(session_id, before, limit)
+    if page is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    history = chat_sessions[session_id]
-    messages = []
-    
-    for msg in history.messages:
-        if isinstance(msg, HumanMessage):
-            role = "user"
-        elif isinstance(msg, AIMessage):
-            role = "assistant"
-        elif isinstance(msg, SystemMessage):
-            role = "system"
-        else:
-            role = "unknown"
-        
-        messages.append({
-            "role": role,
-            "content": msg.content
-        })
+    messages, start, total = page
     
     return {
         "session_id": session_id,
         "messages": messages,
-        "total": len(messages)
+        "next_cursor": start if start > 0 else None,
+        "total": total
     }
 
 
@@ -175,32 +346,28 @@ async def get_history(session_id: str):
 async def delete_session(session_id: str):
     """Delete a chat session and its history"""
     
-    if session_id not in chat_sessions:
+    forget(session_id)
+    if not await session_store.delete(session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
-    del chat_sessions[session_id]
-    del session_metadata[session_id]
-    
     logger.info(f"Deleted chat session: {session_id}")
     
     return {"status": "deleted", "session_id": session_id}
 
 
 @app.get("/sessions")
-async def list_sessions():
-    """List all active sessions"""
-    
-    sessions = []
-    for session_id, metadata in session_metadata.items():
-        message_count = len(chat_sessions[session_id].messages)
-        sessions.append({
-            "session_id": session_id,
-            "model": metadata["model"],
-            "created_at": metadata["created_at"],
-            "message_count": message_count
-        })
-    
-    return {"sessions": sessions, "total": len(sessions)}
+async def list_sessions(
+    before: Optional[float] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
+    """
+    List active sessions, most recently active first; pass next_cursor back as
+    `before` for the next page
+    """
+    
+    sessions, next_cursor, total = await session_store.list_sessions(limit, before)
+    
+    return {"sessions": sessions, "next_cursor": next_cursor, "total": total}
 
 
 if __name__ == "__main__":
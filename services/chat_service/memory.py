@@ -0,0 +1,93 @@
+from typing import List, Set, Tuple
+from libs.model_adapter import count_tokens
+from libs.model_router import model_router
+from libs.utils.config import config
+from libs.utils.logging import setup_logger
+from .session_store import ChatSession, SessionStore
+
+logger = setup_logger("chat-memory")
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+
+Merge the current summary (if any) with the new messages into one concise summary. Keep the facts, names, numbers, decisions and open questions needed to continue the conversation. Reply with the summary only."""
+
+# Sessions with a summary being generated by this process
+_summarizing: Set[str] = set()
+
+def conversation(session: ChatSession) -> List[dict]:
+    """The session's user/assistant messages; summarized_count indexes into these"""
+    return [m for m in session.messages if m["role"] != "system"]
+
+def window_start(messages: List[dict], model: str) -> int:
+    """
+    Index of the oldest message kept verbatim: whole turns back from the newest,
+    up to CHAT_MEMORY_MAX_TURNS and CHAT_MEMORY_TOKEN_BUDGET (the newest turn is always kept)
+    """
+    start = len(messages)
+    turns = 0
+    used = 0
+    while start > 0 and turns < config.CHAT_MEMORY_MAX_TURNS:
+        # A turn starts at a user message
+        turn_start = start - 1
+        while turn_start > 0 and messages[turn_start]["role"] != "user":
+            turn_start -= 1
+        cost = sum(count_tokens(m["content"], model) for m in messages[turn_start:start])
+        if turns and used + cost > config.CHAT_MEMORY_TOKEN_BUDGET:
+            break
+        used += cost
+        turns += 1
+        start = turn_start
+    return start
+
+def build_context(session: ChatSession, user_message: dict) -> Tuple[List[dict], bool]:
+    """
+    Messages to send for the next turn: system prompt, rolling summary, then the
+    recent window verbatim
+    Returns: (messages, whether older turns are waiting to be summarized)
+    """
+    messages = conversation(session) + [user_message]
+    start = window_start(messages, session.model)
+    pending = start - session.summarized_count
+
+    # Turns that left the window but aren't in the summary yet stay verbatim until
+    # the background summary catches up, unless it has fallen far behind
+    if 0 < pending <= 2 * config.CHAT_MEMORY_SUMMARY_BATCH:
+        start = session.summarized_count
+
+    context = [m for m in session.messages if m["role"] == "system"]
+    if session.summary and start > 0:
+        context.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session.summary}"})
+    return context + messages[start:], pending >= config.CHAT_MEMORY_SUMMARY_BATCH
+
+async def refresh_summary(store: SessionStore, session_id: str) -> None:
+    """Fold turns that have left the window into the session's rolling summary"""
+    if session_id in _summarizing:
+        return
+    _summarizing.add(session_id)
+    try:
+        session = await store.get(session_id)
+        if session is None:
+            return
+        messages = conversation(session)
+        start = window_start(messages, session.model)
+        if start - session.summarized_count < config.CHAT_MEMORY_SUMMARY_BATCH:
+            return
+
+        new_messages = "\n\n".join(
+            f"{m['role']}: {m['content']}" for m in messages[session.summarized_count:start]
+        )
+        prompt = f"Current summary:\n{session.summary}\n\n" if session.summary else ""
+        prompt += f"New messages:\n{new_messages}"
+        summary = await model_router.complete(
+            prompt,
+            task_type="summarization",
+            max_tokens=config.CHAT_MEMORY_SUMMARY_MAX_TOKENS,
+            system_prompt=SUMMARY_SYSTEM_PROMPT
+        )
+        if await store.update_summary(session_id, summary, start):
+            logger.info(f"Summarized {start} messages of chat session {session_id}")
+    except Exception as e:
+        # The window still holds the recent turns; the next turn retries
+        logger.warning(f"Chat summary failed for session {session_id}: {e}")
+    finally:
+        _summarizing.discard(session_id)
@@ -0,0 +1,416 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field
+import redis.asyncio as redis
+from libs.utils.config import config
+from libs.utils.metrics import chat_session_cache_requests_total
+
+KEY_PREFIX = "chat:session:"
+INDEX_KEY = "chat:sessions"
+
+# Set the summary only if it covers more messages than the stored one, so a slow
+# summarizer (possibly on another replica) can't overwrite a newer summary
+UPDATE_SUMMARY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+local current = tonumber(redis.call('HGET', KEYS[1], 'summarized_count')) or 0
+if tonumber(ARGV[2]) <= current then
+  return 0
+end
+redis.call('HSET', KEYS[1], 'summary', ARGV[1], 'summarized_count', ARGV[2])
+return 1
+"""
+
+class ChatSession(BaseModel):
+    session_id: str
+    model: str
+    created_at: str
+    system_prompt: Optional[str] = None
+    # {"role": "system" | "user" | "assistant", "content": str}, oldest first
+    messages: List[dict] = Field(default_factory=list)
+    # Rolling summary of the first `summarized_count` non-system messages
+    summary: Optional[str] = None
+    summarized_count: int = 0
+
+class SessionStore(ABC):
+    """Chat sessions with sliding-TTL expiry; every read or write extends the TTL"""
+
+    @abstractmethod
+    async def create(self, session: ChatSession) -> None:
+        """Store a new session, replacing any session with the same id"""
+        pass
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        """Returns: the session, or None if it doesn't exist or has expired"""
+        pass
+
+    @abstractmethod
+    async def get_messages(
+        self, session_id: str, before: Optional[int] = None, limit: int = 50
+    ) -> Optional[Tuple[List[dict], int, int]]:
+        """
+        Page of a session's history: up to limit messages ending just before index
+        `before` (the newest page when None), oldest first. History is append-only,
+        so indexes are stable cursors.
+        Returns: (messages, index of the first message, total messages), or None if the session doesn't exist
+        """
+        pass
+
+    @abstractmethod
+    async def append(self, session_id: str, messages: List[dict]) -> None:
+        """Append messages to an existing session's history"""
+        pass
+
+    @abstractmethod
+    async def update_summary(self, session_id: str, summary: str, summarized_count: int) -> bool:
+        """
+        Replace the rolling summary unless a summary covering as many messages is already stored
+        Returns: False if the update was stale or the session is gone
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Returns: False if the session didn't exist"""
+        pass
+
+    @abstractmethod
+    async def list_sessions(
+        self, limit: int = 50, before: Optional[float] = None
+    ) -> Tuple[List[dict], Optional[float], int]:
+        """
+        Page of live sessions, most recently active first, starting after the
+        session active at `before` (the previous page's cursor)
+        Returns: (session_id, model, created_at, last_active and message_count of
+        each session, cursor of the next page or None, total live sessions)
+        """
+        pass
+
+class LRU:
+    """Bounded OrderedDict with a TTL per entry"""
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.time():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        if self.ttl:
+            self._items[key] = (value, time.time() + self.ttl)
+        return value
+
+    def put(self, key: str, value) -> None:
+        self._items[key] = (value, time.time() + self.ttl if self.ttl else None)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def pop(self, key: str):
+        item = self._items.pop(key, None)
+        return item[0] if item else None
+
+    def values(self) -> list:
+        now = time.time()
+        return [value for value, expires_at in self._items.values() if expires_at is None or expires_at >= now]
+
+    def items_by_expiry(self) -> list:
+        """Returns: (key, value, expires_at) of live entries, latest expiry first"""
+        now = time.time()
+        return sorted(
+            ((key, value, expires_at) for key, (value, expires_at) in self._items.items()
+             if expires_at is None or expires_at >= now),
+            key=lambda item: item[2] or 0.0,
+            reverse=True
+        )
+
+class MemorySessionStore(SessionStore):
+    """
+    Single-process store for development and tests: bounded LRU, sessions lost on
+    restart and not shared between replicas
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl: Optional[int] = None):
+        self._sessions = LRU(max_sessions or config.CHAT_SESSION_CACHE_SIZE, ttl or config.CHAT_SESSION_TTL_SECONDS)
+
+    async def create(self, session: ChatSession) -> None:
+        self._sessions.put(session.session_id, session.model_copy(deep=True))
+
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        session = self._sessions.get(session_id)
+        return session.model_copy(deep=True) if session else None
+
+    async def get_messages(
+        self, session_id: str, before: Optional[int] = None, limit: int = 50
+    ) -> Optional[Tuple[List[dict], int, int]]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        total = len(session.messages)
+        end = total if before is None else min(max(before, 0), total)
+        start = max(end - limit, 0)
+        return [dict(m) for m in session.messages[start:end]], start, total
+
+    async def append(self, session_id: str, messages: List[dict]) -> None:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.messages.extend(messages)
+
+    async def update_summary(self, session_id: str, summary: str, summarized_count: int) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None or summarized_count <= session.summarized_count:
+            return False
+        session.summary = summary
+        session.summarized_count = summarized_count
+        return True
+
+    async def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id) is not None
+
+    async def list_sessions(
+        self, limit: int = 50, before: Optional[float] = None
+    ) -> Tuple[List[dict], Optional[float], int]:
+        ttl = self._sessions.ttl or 0
+        live = [(session, expires_at - ttl) for _, session, expires_at in self._sessions.items_by_expiry()]
+        page = [
+            _listing(session, len(session.messages), last_active)
+            for session, last_active in live if before is None or last_active < before
+        ]
+        next_cursor = page[limit - 1]["last_active"] if len(page) > limit else None
+        return page[:limit], next_cursor, len(live)
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions shared by every replica through Redis, with an in-process LRU of hot
+    sessions in front
+
+    Each session is a metadata hash plus a message list, so a turn is an RPUSH
+    rather than a rewrite of the whole history. A hot-cache hit is confirmed
+    with LLEN (sent in the same round trip as the TTL refresh); if another
+    replica appended in the meantime, only the new tail is fetched.
+    """
+
+    def __init__(self, url: Optional[str] = None, ttl: Optional[int] = None, cache_size: Optional[int] = None):
+        self.url = url or config.REDIS_URL
+        self.ttl = ttl or config.CHAT_SESSION_TTL_SECONDS
+        self._hot = LRU(cache_size or config.CHAT_SESSION_CACHE_SIZE, self.ttl)
+        self._client = None
+        self._update_summary = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    def _keys(self, session_id: str) -> tuple:
+        return f"{KEY_PREFIX}{session_id}", f"{KEY_PREFIX}{session_id}:messages"
+
+    async def create(self, session: ChatSession) -> None:
+        meta_key, messages_key = self._keys(session.session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(meta_key, messages_key)
+            pipe.hset(meta_key, mapping={
+                "model": session.model,
+                "created_at": session.created_at,
+                "system_prompt": session.system_prompt or "",
+                "summary": session.summary or "",
+                "summarized_count": session.summarized_count
+            })
+            if session.messages:
+                pipe.rpush(messages_key, *(json.dumps(m) for m in session.messages))
+            pipe.expire(meta_key, self.ttl)
+            pipe.expire(messages_key, self.ttl)
+            pipe.zadd(INDEX_KEY, {session.session_id: time.time()})
+            await pipe.execute()
+        self._hot.put(session.session_id, session.model_copy(deep=True))
+
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        meta_key, messages_key = self._keys(session_id)
+        hot = self._hot.get(session_id)
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            if hot is None:
+                pipe.hgetall(meta_key)
+                pipe.lrange(messages_key, 0, -1)
+            else:
+                pipe.hmget(meta_key, "model", "summarized_count")
+                pipe.llen(messages_key)
+            self._touch(pipe, session_id)
+            first, second, *_ = await pipe.execute()
+
+        if hot is None:
+            chat_session_cache_requests_total.labels(result="miss").inc()
+            if not first:
+                return None
+            session = ChatSession(
+                session_id=session_id,
+                model=first["model"],
+                created_at=first["created_at"],
+                system_prompt=first.get("system_prompt") or None,
+                messages=[json.loads(m) for m in second],
+                summary=first.get("summary") or None,
+                summarized_count=int(first.get("summarized_count") or 0)
+            )
+            self._hot.put(session_id, session)
+            return session.model_copy(deep=True)
+
+        model, summarized_count = first
+        if model is None:
+            # Deleted or expired on another replica
+            self._hot.pop(session_id)
+            chat_session_cache_requests_total.labels(result="stale").inc()
+            return None
+        if int(summarized_count or 0) != hot.summarized_count:
+            # Summarized on another replica
+            hot.summary = await self.client.hget(meta_key, "summary") or None
+            hot.summarized_count = int(summarized_count or 0)
+        if second != len(hot.messages):
+            chat_session_cache_requests_total.labels(result="stale").inc()
+            if second > len(hot.messages):
+                tail = await self.client.lrange(messages_key, len(hot.messages), -1)
+                hot.messages.extend(json.loads(m) for m in tail)
+            else:
+                hot.messages = [json.loads(m) for m in await self.client.lrange(messages_key, 0, -1)]
+        else:
+            chat_session_cache_requests_total.labels(result="hit").inc()
+        return hot.model_copy(deep=True)
+
+    async def get_messages(
+        self, session_id: str, before: Optional[int] = None, limit: int = 50
+    ) -> Optional[Tuple[List[dict], int, int]]:
+        meta_key, messages_key = self._keys(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.exists(meta_key)
+            pipe.llen(messages_key)
+            if before is None:
+                pipe.lrange(messages_key, -limit, -1)
+            elif before > 0:
+                pipe.lrange(messages_key, max(before - limit, 0), before - 1)
+            self._touch(pipe, session_id)
+            results = await pipe.execute()
+
+        exists, total = results[0], results[1]
+        if not exists:
+            return None
+        if before is None:
+            start = max(total - limit, 0)
+        elif before > 0:
+            start = max(before - limit, 0)
+        else:
+            return [], 0, total
+        return [json.loads(m) for m in results[2]], start, total
+
+    async def append(self, session_id: str, messages: List[dict]) -> None:
+        if not messages:
+            return
+        meta_key, messages_key = self._keys(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(messages_key, *(json.dumps(m) for m in messages))
+            self._touch(pipe, session_id)
+            length, *_ = await pipe.execute()
+
+        hot = self._hot.get(session_id)
+        if hot is not None:
+            if length == len(hot.messages) + len(messages):
+                hot.messages.extend(messages)
+            else:
+                # Another replica appended concurrently; reload on next get
+                self._hot.pop(session_id)
+
+    async def update_summary(self, session_id: str, summary: str, summarized_count: int) -> bool:
+        if self._update_summary is None:
+            self._update_summary = self.client.register_script(UPDATE_SUMMARY_SCRIPT)
+        meta_key, _ = self._keys(session_id)
+        updated = await self._update_summary(keys=[meta_key], args=[summary, summarized_count])
+        hot = self._hot.get(session_id)
+        if updated and hot is not None:
+            hot.summary = summary
+            hot.summarized_count = summarized_count
+        return bool(updated)
+
+    async def delete(self, session_id: str) -> bool:
+        self._hot.pop(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(*self._keys(session_id))
+            pipe.zrem(INDEX_KEY, session_id)
+            deleted, _ = await pipe.execute()
+        return deleted > 0
+
+    async def list_sessions(
+        self, limit: int = 50, before: Optional[float] = None
+    ) -> Tuple[List[dict], Optional[float], int]:
+        # The index is scored by last activity; entries older than the TTL belong
+        # to sessions Redis has expired
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(INDEX_KEY, "-inf", time.time() - self.ttl)
+            pipe.zrevrangebyscore(
+                INDEX_KEY, "+inf" if before is None else f"({before}", "-inf",
+                start=0, num=limit, withscores=True
+            )
+            pipe.zcard(INDEX_KEY)
+            _, entries, total = await pipe.execute()
+        if not entries:
+            return [], None, total
+
+        # The list length is the message count; no history is read
+        async with self.client.pipeline(transaction=False) as pipe:
+            for session_id, _ in entries:
+                meta_key, messages_key = self._keys(session_id)
+                pipe.hmget(meta_key, "model", "created_at")
+                pipe.llen(messages_key)
+            results = await pipe.execute()
+
+        sessions = []
+        for i, (session_id, last_active) in enumerate(entries):
+            (model, created_at), count = results[2 * i], results[2 * i + 1]
+            if model is not None:
+                sessions.append({
+                    "session_id": session_id,
+                    "model": model,
+                    "created_at": created_at,
+                    "last_active": last_active,
+                    "message_count": count
+                })
+        next_cursor = entries[-1][1] if len(entries) == limit else None
+        return sessions, next_cursor, total
+
+    def _touch(self, pipe, session_id: str) -> None:
+        """Queue the sliding-TTL refresh for a session on pipe"""
+        for key in self._keys(session_id):
+            pipe.expire(key, self.ttl)
+        pipe.zadd(INDEX_KEY, {session_id: time.time()}, xx=True)
+
+def _listing(session: ChatSession, message_count: int, last_active: float) -> dict:
+    return {
+        "session_id": session.session_id,
+        "model": session.model,
+        "created_at": session.created_at,
+        "last_active": last_active,
+        "message_count": message_count
+    }
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """Build the session store selected by CHAT_SESSION_BACKEND"""
+    backend = (backend or config.CHAT_SESSION_BACKEND).lower()
+
+    if backend == "redis":
+        return RedisSessionStore()
+    elif backend == "memory":
+        return MemorySessionStore()
+    else:
+        raise ValueError(f"Unknown chat session backend: {backend}")
+
+session_store = create_session_store()
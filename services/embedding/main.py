@@ -1,10 +1,11 @@
+import asyncio
 from fastapi import FastAPI
 from prometheus_client import make_asgi_app
 import aiosqlite
-import chromadb
-from openai import OpenAI
 from libs.utils.logging import setup_logger
 from libs.utils.config import config
+from libs.vector_store import vector_store
+from libs.retrieval import aembed_texts
 
 logger = setup_logger("embedding-service")
 app = FastAPI(title="Embedding Service")
@@ -12,11 +13,8 @@ app = FastAPI(title="Embedding Service")
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
-openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
-chroma_client = chromadb.HttpClient(host=config.CHROMA_HOST, port=config.CHROMA_PORT)
-
 async def embed_chunks(chunk_ids: list, collection_id: str):
-    """Generate embeddings and store in ChromaDB"""
+    """Generate embeddings and store in the vector store"""
     try:
         async with aiosqlite.connect(config.SQLITE_DB_PATH) as conn:
             # Fetch chunks
@@ -32,17 +30,12 @@ async def embed_chunks(chunk_ids: list, collection_id: str):
         
         # Generate embeddings
         texts = [chunk[1] for chunk in chunks]
-        response = openai_client.embeddings.create(
-            model="text-embedding-ada-002",
-            input=texts
-        )
-        
-        embeddings = [item.embedding for item in response.data]
-        
-        # Store in ChromaDB
-        collection = chroma_client.get_or_create_collection(f"collection_{collection_id}")
+        embeddings = await aembed_texts(texts)
         
-        collection.add(
+        # Store in vector store (may extend the collection's HNSW index, so off the event loop)
+        await asyncio.to_thread(
+            vector_store.add,
+            collection_id,
             ids=[chunk[0] for chunk in chunks],
             embeddings=embeddings,
             metadatas=[{
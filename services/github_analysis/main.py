@@ -11,6 +11,7 @@ import google.generativeai as genai
 from pathlib import Path
 from libs.utils.logging import setup_logger
 from libs.utils.config import config
+from libs.model_adapter import client_registry
 
 logger = setup_logger("github-analysis")
 app = FastAPI(title="GitHub Analysis Service")
@@ -125,7 +126,7 @@ def analyze_repository_structure(repo_path: str) -> dict:
 def generate_readme_with_gemini(repo_info: dict, project_name: str, project_description: Optional[str]) -> str:
     """Generate README using Gemini API"""
     try:
-        model = genai.GenerativeModel('gemini-pro')
+        model = client_registry.gemini_model('gemini-pro')
         
         prompt = f"""Generate a comprehensive and professional README.md file for a GitHub repository with the following information:
 
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Hedged requests must not erode the latency p95 they hedge against
+
+hedged() cancels a slow primary once the backup answers. If those cancelled
+calls left no sample, the p95 would be built from winners only and the hedge
+delay would keep shrinking.
+
+Usage: python -m pytest test_hedging.py
+"""
+
+import asyncio
+import itertools
+
+from libs.model_router.health import HealthTracker, TrackedModelAdapter
+from libs.model_router.hedging import HedgeBudget, hedged
+
+FAST, SLOW = 0.005, 0.1
+
+# One slow call in ten, half of those twice as slow: the tail beyond p95 that gets hedged
+TAIL = [FAST] * 18 + [SLOW, 2 * SLOW]
+
+class SleepAdapter:
+    """Cycles through fixed latencies"""
+
+    def __init__(self, latencies):
+        self.latencies = itertools.cycle(latencies)
+
+    async def complete(self, prompt, model, stream=False, **kwargs):
+        await asyncio.sleep(next(self.latencies))
+        return model
+
+def test_hedging_keeps_p95():
+    tracker = HealthTracker(window=20, window_seconds=600)
+    primary = TrackedModelAdapter(SleepAdapter(TAIL), "openai", tracker)
+    backup = TrackedModelAdapter(SleepAdapter([FAST]), "gemini", tracker)
+    health = tracker.get("openai", "primary")
+
+    async def run():
+        for _ in range(len(TAIL)):
+            await primary.complete("q", "primary")
+        before = health.percentile(95)
+
+        budget = HedgeBudget(ratio=1.0, burst=100)
+        outcomes = []
+        for _ in range(2 * len(TAIL)):
+            _, outcome = await hedged(
+                lambda: primary.complete("q", "primary"),
+                lambda: backup.complete("q", "backup"),
+                # The router hedges at the primary's p95
+                health.percentile(95),
+                budget
+            )
+            outcomes.append(outcome)
+        return before, health.percentile(95), outcomes
+
+    before, after, outcomes = asyncio.run(run())
+    assert before > SLOW
+    assert "hedge" in outcomes
+    assert after >= 0.9 * before
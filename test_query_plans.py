@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Query plan audit for the API gateway
+
+Builds the gateway schema (tables plus migrations) in a temporary database,
+then runs EXPLAIN QUERY PLAN on every SQL statement in
+services/api_gateway/main.py and fails on full scans of tables that grow with
+usage. New gateway queries are picked up automatically; queries assembled at
+runtime are listed in COMPOSED_QUERIES.
+
+Usage: python -m pytest test_query_plans.py
+"""
+
+import ast
+import asyncio
+import re
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+GATEWAY_MAIN = Path(__file__).parent / "services" / "api_gateway" / "main.py"
+
+LARGE_TABLES = {
+    "users", "collections", "documents", "chunks", "chat_sessions", "chat_messages", "tasks"
+}
+
+# Statements built from fragments at runtime, in their fullest form
+COMPOSED_QUERIES = [
+    # list_chat_sessions / get_messages with a cursor
+    "SELECT id, user_id, model, collection_id, created_at, message_count, rowid FROM chat_sessions "
+    "WHERE user_id = ? AND (created_at, rowid) < (?, ?) ORDER BY created_at DESC, rowid DESC LIMIT ?",
+    "SELECT id, session_id, role, content, created_at, rowid FROM chat_messages "
+    "WHERE session_id = ? AND (created_at, rowid) < (?, ?) ORDER BY created_at DESC, rowid DESC LIMIT ?",
+    # update_task
+    "UPDATE tasks SET title = ?, status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+]
+
+SCAN = re.compile(r"^SCAN (\w+)")
+
+def gateway_queries():
+    """Every SELECT/UPDATE/DELETE string literal in the gateway, as (line, statement)"""
+    tree = ast.parse(GATEWAY_MAIN.read_text())
+    queries = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            statement = " ".join(node.value.split())
+            if re.match(r"(SELECT|UPDATE|DELETE)\b", statement) and "?" in statement:
+                queries.append((node.lineno, statement))
+    return queries
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    from services.api_gateway.database import Database
+
+    database = Database(read_pool_size=1)
+    database.db_path = str(tmp_path_factory.mktemp("plans") / "gateway.db")
+    asyncio.run(database.connect())
+    asyncio.run(database.disconnect())
+
+    connection = sqlite3.connect(database.db_path)
+    yield connection
+    connection.close()
+
+def full_scans(conn, statement):
+    params = [None] * statement.count("?")
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+    return [
+        detail for *_, detail in plan
+        if (match := SCAN.match(detail)) and match.group(1) in LARGE_TABLES
+    ]
+
+def test_queries_are_found():
+    assert len(gateway_queries()) >= 20
+
+@pytest.mark.parametrize(
+    "statement",
+    [statement for _, statement in gateway_queries()] + COMPOSED_QUERIES
+)
+def test_no_full_scans(conn, statement):
+    scans = full_scans(conn, statement)
+    assert not scans, f"{statement}\n  full scan: {scans}"
+
+def test_migrate_upgrades_old_schema(tmp_path):
+    import aiosqlite
+    from services.api_gateway.migrations import MIGRATIONS, migrate
+
+    path = tmp_path / "old.db"
+    old = sqlite3.connect(path)
+    old.executescript("""
+        CREATE TABLE users (id TEXT PRIMARY KEY, email TEXT, created_at TIMESTAMP);
+        CREATE TABLE documents (id TEXT PRIMARY KEY, collection_id TEXT, filename TEXT, status TEXT, created_at TIMESTAMP);
+        CREATE TABLE tasks (id TEXT PRIMARY KEY, user_id TEXT, created_at TIMESTAMP);
+        CREATE TABLE chat_sessions (id TEXT PRIMARY KEY, user_id TEXT, created_at TIMESTAMP);
+        CREATE TABLE chat_messages (id TEXT PRIMARY KEY, session_id TEXT, created_at TIMESTAMP);
+        INSERT INTO chat_sessions VALUES ('s1', 'u1', '2024-01-01'), ('s2', 'u1', '2024-01-02');
+        INSERT INTO chat_messages VALUES ('m1', 's1', '2024-01-01'), ('m2', 's1', '2024-01-01');
+    """)
+    old.close()
+
+    async def run():
+        async with aiosqlite.connect(path) as conn:
+            return await migrate(conn), await migrate(conn)
+
+    # Second run is a no-op
+    assert asyncio.run(run()) == (MIGRATIONS[-1][0],) * 2
+
+    conn = sqlite3.connect(path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+    assert {"first_name", "last_name"} <= set(columns)
+    counts = dict(conn.execute("SELECT id, message_count FROM chat_sessions"))
+    assert counts == {"s1": 2, "s2": 0}
+    conn.close()